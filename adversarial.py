@@ -0,0 +1,289 @@
+import time
+from itertools import product
+
+from flowfield import UNREACHABLE
+
+# Độ sâu tối đa (số lượt: ông chủ đi, trộm đi, ...) của tìm kiếm làm sâu dần
+MAX_DEPTH = 6
+
+# Ngân sách mỗi lần quyết định: thời gian (giây, khi chơi có giao diện) hoặc số nút (tất định)
+SEARCH_BUDGET = 0.003
+NODE_LIMIT = 3000
+
+# Số ông chủ tối đa được tìm kiếm cùng nhau (nước đi kết hợp tăng theo 5^số ông chủ)
+SEARCH_GUARDS = 2
+
+# Mô hình nhân vật trộm: đối thủ tệ nhất (minimax, cắt tỉa alpha-beta) hoặc đi theo AI của nó
+# với xác suất THIEF_POLICY_WEIGHT, còn lại chọn đều các nước (expectimax)
+MINIMAX = "minimax"
+EXPECTIMAX = "expectimax"
+THIEF_POLICY_WEIGHT = 0.8
+
+# Hàm đánh giá (theo góc nhìn ông chủ): bắt được là thắng, càng sớm càng tốt; ngược lại
+# ông chủ gần trộm hơn và trộm xa đích hơn là tốt
+CAPTURE_SCORE = 1000000
+GUARD_DISTANCE_WEIGHT = 4
+GOAL_DISTANCE_WEIGHT = 1
+FAR = 10000  # Khoảng cách dùng khi không tới được
+
+# Bán kính (số bước) của BFS cục bộ quanh trộm khi tính khoảng cách từ ông chủ: ông chủ đang
+# đuổi bắt đã ở gần trộm, ô xa hơn coi như cách DISTANCE_RADIUS + 1 bước
+DISTANCE_RADIUS = 24
+
+# Số mục tối đa của bảng chuyển vị và cache quyết định (đầy thì xoá hết)
+TABLE_SIZE = 1 << 18
+DECISION_CACHE_SIZE = 4096
+
+# Loại giá trị lưu trong bảng chuyển vị
+EXACT, LOWER, UPPER = range(3)
+
+_MASK64 = (1 << 64) - 1
+_GOAL_SLOT = 255
+
+
+# Hàm băm 64 bit (splitmix64): khoá Zobrist của (vai trò, ô) tính khi cần thay vì lập bảng
+# ngẫu nhiên cho mọi ô (bản đồ lớn có hàng trăm nghìn ô)
+def splitmix64(x):
+    x = (x + 0x9E3779B97F4A7C15) & _MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return x ^ (x >> 31)
+
+
+_SIDE_KEY = splitmix64(1 << 40)  # Lượt của trộm
+
+
+class _OutOfBudget(Exception):
+    pass
+
+
+# Bộ lập kế hoạch dự đoán cho các ông chủ đang đuổi bắt: tìm kiếm làm sâu dần trên các nước
+# đi kết hợp của ông chủ và trộm (ông chủ đi trước vì trộm đã đi trong bước này), minimax với
+# cắt tỉa alpha-beta hoặc expectimax, bảng chuyển vị băm Zobrist (giữ qua các bước) và
+# heuristic từ trường khoảng cách. Dừng khi hết ngân sách (thời gian, hoặc số nút để kết quả
+# tất định) và dùng kết quả của độ sâu cuối cùng đã xong; trạng thái lặp lại dùng quyết định cũ.
+class PredictivePlanner:
+    def __init__(self, guard_neighbors, thief_neighbors, max_depth=MAX_DEPTH, budget=None,
+                 node_limit=NODE_LIMIT, thief_model=MINIMAX, radius=DISTANCE_RADIUS):
+        self.guard_neighbors = guard_neighbors
+        self.thief_neighbors = thief_neighbors
+        self.radius = radius
+        self.max_depth = max_depth
+        self.budget = budget  # Giây cho mỗi quyết định; None = chỉ giới hạn số nút (tất định)
+        self.node_limit = node_limit
+        self.thief_model = thief_model
+        self.table = {}  # khoá Zobrist -> (độ sâu, giá trị, loại, nước đi tốt nhất)
+        self.decisions = {}  # khoá Zobrist của gốc -> (độ sâu, nước đi)
+        self._keys = {}
+        self._dist = {}  # id ô của trộm -> {id ô: khoảng cách}, tính lại mỗi lần quyết định
+        self.nodes = 0  # Số nút của lần quyết định gần nhất
+        self.depth = 0  # Độ sâu đã tìm xong ở lần quyết định gần nhất
+        self.searches = 0
+        self.cache_hits = 0
+        self.table_hits = 0
+        self.cutoffs = 0
+
+    def _key(self, slot, cell):
+        key = self._keys.get((slot, cell))
+        if key is None:
+            key = splitmix64(slot << 32 | cell)
+            self._keys[(slot, cell)] = key
+        return key
+
+    # Khoảng cách (id ô -> số bước trên lưới của ông chủ) tới ô cell: BFS cục bộ trong bán kính
+    # radius nên chi phí không tăng theo kích thước bản đồ; ô không có trong kết quả cách xa hơn
+    def _distance_to(self, cell):
+        dist = self._dist.get(cell)
+        if dist is None:
+            dist = {cell: 0}
+            frontier = [cell]
+            neighbors = self.guard_neighbors
+            for d in range(1, self.radius + 1):
+                wave = []
+                for u in frontier:
+                    for v in neighbors[u]:
+                        if v not in dist:
+                            dist[v] = d
+                            wave.append(v)
+                if not wave:
+                    break
+                frontier = wave
+            self._dist[cell] = dist
+        return dist
+
+    # Đánh giá trạng thái không bắt được: ông chủ gần nhất càng gần trộm và trộm càng xa đích càng tốt
+    def _evaluate(self, guards, thief):
+        dist = self._distance_to(thief)
+        far = self.radius + 1
+        score = -GUARD_DISTANCE_WEIGHT * min(dist.get(g, far) for g in guards)
+        if self._goal_dist is not None:
+            d = int(self._goal_dist[thief])
+            score += GOAL_DISTANCE_WEIGHT * (FAR if d == UNREACHABLE else d)
+        return score
+
+    # Nước đi kết hợp của các ông chủ (mỗi ông chủ đứng yên hoặc sang ô kề, không trùng ô),
+    # sắp theo tổng khoảng cách tới trộm để cắt tỉa sớm
+    def _guard_moves(self, guards, thief):
+        dist = self._distance_to(thief)
+        options = [(g,) + self.guard_neighbors[g] for g in guards]
+        moves = [move for move in product(*options) if len(set(move)) == len(move)]
+        far = self.radius + 1
+        moves.sort(key=lambda move: sum(dist.get(g, far) for g in move))
+        return moves
+
+    # Nước đi của trộm: nước theo AI của trộm trước, sau đó các nước xa ông chủ hơn
+    def _thief_moves(self, guards, thief):
+        moves = (thief,) + self.thief_neighbors[thief]
+        policy = self._policy_move(thief)
+        return sorted(moves, key=lambda t: (t != policy, t in guards))
+
+    # Nước đi của trộm theo AI của nó: xuống dốc trường khoảng cách tới đích
+    def _policy_move(self, thief):
+        goal_dist = self._goal_dist
+        if goal_dist is None:
+            return thief
+        return min((thief,) + self.thief_neighbors[thief], key=lambda t: int(goal_dist[t]))
+
+    def _check_budget(self):
+        self.nodes += 1
+        if self.nodes >= self.node_limit:
+            raise _OutOfBudget
+        if self._deadline is not None and self.nodes & 31 == 0 and time.perf_counter() >= self._deadline:
+            raise _OutOfBudget
+
+    # Giá trị bắt được lưu trong bảng theo khoảng cách từ nút (không phụ thuộc độ sâu của nút)
+    @staticmethod
+    def _to_table(value, ply):
+        return value + ply if value > CAPTURE_SCORE // 2 else value
+
+    @staticmethod
+    def _from_table(value, ply):
+        return value - ply if value > CAPTURE_SCORE // 2 else value
+
+    def _search(self, key, guards, thief, depth, alpha, beta, ply):
+        self._check_budget()
+        if thief in guards:
+            return CAPTURE_SCORE - ply
+        if depth == 0:
+            return self._evaluate(guards, thief)
+        guard_turn = ply % 2 == 0
+        expectimax = self.thief_model == EXPECTIMAX
+        hint = None
+        entry = self.table.get(key)
+        if entry is not None:
+            entry_depth, value, flag, hint = entry
+            if entry_depth >= depth:
+                value = self._from_table(value, ply)
+                self._root_move = hint if ply == 0 else self._root_move
+                if flag == EXACT:
+                    self.table_hits += 1
+                    return value
+                if flag == LOWER:
+                    alpha = max(alpha, value)
+                elif flag == UPPER:
+                    beta = min(beta, value)
+                if alpha >= beta:
+                    self.table_hits += 1
+                    return value
+        alpha0, beta0 = alpha, beta
+
+        if guard_turn:
+            moves = self._guard_moves(guards, thief)
+            if hint in moves:
+                moves.remove(hint)
+                moves.insert(0, hint)
+            best, best_move = -CAPTURE_SCORE * 2, None
+            for move in moves:
+                child = key ^ _SIDE_KEY
+                for slot, (old, new) in enumerate(zip(guards, move), 1):
+                    if old != new:
+                        child ^= self._key(slot, old) ^ self._key(slot, new)
+                value = self._search(child, move, thief, depth - 1, alpha, beta, ply + 1)
+                if value > best:
+                    best, best_move = value, move
+                alpha = max(alpha, value)
+                if alpha >= beta:
+                    self.cutoffs += 1
+                    break
+        elif expectimax:
+            # Nút ngẫu nhiên: không cắt tỉa, các nút con được tìm với cửa sổ đầy đủ
+            moves = self._thief_moves(guards, thief)
+            policy = self._policy_move(thief)
+            total, best_move = 0.0, policy
+            for move in moves:
+                child = key ^ _SIDE_KEY
+                if move != thief:
+                    child ^= self._key(0, thief) ^ self._key(0, move)
+                value = self._search(child, guards, move, depth - 1, -CAPTURE_SCORE * 2, CAPTURE_SCORE * 2, ply + 1)
+                weight = (1 - THIEF_POLICY_WEIGHT) / len(moves) + (THIEF_POLICY_WEIGHT if move == policy else 0)
+                total += weight * value
+            best = total
+        else:
+            moves = self._thief_moves(guards, thief)
+            if hint in moves:
+                moves.remove(hint)
+                moves.insert(0, hint)
+            best, best_move = CAPTURE_SCORE * 2, None
+            for move in moves:
+                child = key ^ _SIDE_KEY
+                if move != thief:
+                    child ^= self._key(0, thief) ^ self._key(0, move)
+                value = self._search(child, guards, move, depth - 1, alpha, beta, ply + 1)
+                if value < best:
+                    best, best_move = value, move
+                beta = min(beta, value)
+                if alpha >= beta:
+                    self.cutoffs += 1
+                    break
+
+        if expectimax and not guard_turn:
+            flag = EXACT
+        elif best <= alpha0:
+            flag = UPPER
+        elif best >= beta0:
+            flag = LOWER
+        else:
+            flag = EXACT
+        if len(self.table) >= TABLE_SIZE:
+            self.table.clear()
+        self.table[key] = (depth, self._to_table(best, ply), flag, best_move)
+        if ply == 0:
+            self._root_move = best_move  # Bảng có thể bị xoá giữa chừng nên giữ riêng nước ở gốc
+        return best
+
+    # Nước đi tiếp theo (tuple id ô, theo thứ tự guards) cho các ông chủ tại guards (id ô) khi
+    # trộm ở thief; goal_dist: trường khoảng cách (mảng phẳng) tới đích goal (id ô) hiện tại
+    # của trộm hoặc None. Trả về None nếu hết ngân sách trước khi tìm xong độ sâu 1
+    def decide(self, guards, thief, goal_dist=None, goal=None):
+        guards = tuple(guards)
+        self.searches += 1
+        self._goal_dist = goal_dist
+        self._dist = {}
+        key = self._key(_GOAL_SLOT, 0xFFFFFFFF if goal is None else goal) ^ self._key(0, thief)
+        for slot, g in enumerate(guards, 1):
+            key ^= self._key(slot, g)
+        cached = self.decisions.get(key)
+        if cached is not None and cached[0] >= self.max_depth:
+            self.cache_hits += 1
+            self.nodes, self.depth = 0, cached[0]
+            return cached[1]
+
+        self.nodes = 0
+        self._deadline = time.perf_counter() + self.budget if self.budget is not None else None
+        best_move, self.depth = None, 0
+        self._root_move = None
+        try:
+            for depth in range(1, self.max_depth + 1):
+                value = self._search(key, guards, thief, depth, -CAPTURE_SCORE * 2, CAPTURE_SCORE * 2, 0)
+                best_move, self.depth = self._root_move, depth
+                if value > CAPTURE_SCORE // 2:
+                    break  # Đã tìm được cách bắt chắc chắn
+        except _OutOfBudget:
+            pass
+        if cached is None or self.depth > cached[0]:
+            if len(self.decisions) >= DECISION_CACHE_SIZE:
+                self.decisions.clear()
+            self.decisions[key] = (self.depth, best_move)
+        elif cached is not None:
+            best_move = cached[1]
+        return best_move
@@ -0,0 +1,142 @@
+from collections import OrderedDict
+
+import pygame
+
+from level import decode_gid
+
+# Số biến thể (đã phóng to/lật/xoay) giữ trong cache
+VARIANT_CACHE_SIZE = 512
+
+# Chiều rộng tối đa của atlas (pixel)
+ATLAS_MAX_WIDTH = 1024
+
+# Khoảng trống giữa các ảnh trong atlas (tránh lem màu khi phóng to)
+ATLAS_PADDING = 1
+
+
+# Xếp các hình chữ nhật (khoá, rộng, cao) theo từng kệ (shelf packing): sắp theo chiều cao
+# giảm dần, lấp từng hàng từ trái sang phải. Trả về ({khoá: (x, y)}, rộng, cao)
+def pack_shelves(sizes, max_width=ATLAS_MAX_WIDTH, padding=ATLAS_PADDING):
+    widest = max((w for _, w, _ in sizes), default=0) + padding
+    area = sum((w + padding) * (h + padding) for _, w, h in sizes)
+    width = min(max_width, max(widest, int(area ** 0.5) + 1))
+    positions = {}
+    x = y = shelf_height = 0
+    used_width = 0
+    for key, w, h in sorted(sizes, key=lambda size: (-size[2], -size[1])):
+        if x + w > width and x > 0:
+            y += shelf_height + padding
+            x = shelf_height = 0
+        positions[key] = (x, y)
+        x += w + padding
+        used_width = max(used_width, x)
+        shelf_height = max(shelf_height, h)
+    return positions, max(used_width, 1), max(y + shelf_height, 1)
+
+
+# Các ảnh tile mà một bản đồ dùng đến, ghép vào một surface duy nhất (đã convert_alpha);
+# mỗi GID là một subsurface của atlas nên không tải/chuyển đổi từng file riêng lẻ
+class TileAtlas:
+    def __init__(self, tiles):
+        images = {}
+        for gid, (path, _, _) in tiles.items():
+            try:
+                images[gid] = pygame.image.load(path)
+            except (pygame.error, FileNotFoundError) as e:
+                print(f"Error loading tile {gid} ({path}): {e}")
+        sizes = [(gid, image.get_width(), image.get_height()) for gid, image in images.items()]
+        positions, width, height = pack_shelves(sizes)
+        surface = pygame.Surface((width, height), pygame.SRCALPHA)
+        for gid, image in images.items():
+            surface.blit(image, positions[gid])
+        self.surface = surface.convert_alpha() if pygame.display.get_surface() else surface
+        self.regions = {gid: pygame.Rect(positions[gid], images[gid].get_size()) for gid in images}
+        self._images = {}
+
+    def __contains__(self, gid):
+        return gid in self.regions
+
+    # Ảnh gốc của một GID (subsurface, không sao chép điểm ảnh)
+    def image(self, gid):
+        image = self._images.get(gid)
+        if image is None:
+            image = self.surface.subsurface(self.regions[gid])
+            self._images[gid] = image
+        return image
+
+
+# Quản lý ảnh: atlas tile của bản đồ và cache LRU các biến thể đã biến đổi, khoá theo
+# (gid, cờ lật, góc xoay, kích thước); sprite sheet của nhân vật cũng được cắt qua cache này
+class AssetManager:
+    def __init__(self, level=None, capacity=VARIANT_CACHE_SIZE):
+        self.atlas = TileAtlas(level.tiles) if level is not None else None
+        self.capacity = capacity
+        self.variants = OrderedDict()
+        self.sheets = {}
+        self.hits = 0  # Số lần lấy được biến thể từ cache (để đo)
+        self.misses = 0
+
+    def _get(self, key, build):
+        image = self.variants.get(key)
+        if image is not None:
+            self.variants.move_to_end(key)
+            self.hits += 1
+            return image
+        self.misses += 1
+        image = build()
+        self.variants[key] = image
+        if len(self.variants) > self.capacity:
+            self.variants.popitem(last=False)
+        return image
+
+    def has_tile(self, gid):
+        return self.atlas is not None and gid in self.atlas
+
+    # Ảnh tile của layer (GID gốc kèm cờ lật) đã phóng to thành size; lật chéo giống pytmx
+    def tile(self, raw_gid, size):
+        gid, flip_x, flip_y, flip_diagonal = decode_gid(raw_gid)
+
+        def build():
+            image = self.atlas.image(gid)
+            if flip_diagonal:
+                image = pygame.transform.flip(pygame.transform.rotate(image, 270), True, False)
+            if flip_x or flip_y:
+                image = pygame.transform.flip(image, flip_x, flip_y)
+            return pygame.transform.scale(image, size)
+        return self._get((gid, flip_x, flip_y, flip_diagonal, 0, size), build)
+
+    # Ảnh đồ nội thất: phóng to thành size, lật rồi xoay rotation độ (theo chiều kim đồng hồ như Tiled)
+    def furniture(self, raw_gid, size, rotation=0):
+        gid, flip_x, flip_y, _ = decode_gid(raw_gid)
+
+        def build():
+            image = pygame.transform.scale(self.atlas.image(gid), size)
+            if flip_x or flip_y:
+                image = pygame.transform.flip(image, flip_x, flip_y)
+            if rotation != 0:
+                image = pygame.transform.rotate(image, -rotation)  # Pygame xoay ngược chiều kim đồng hồ
+            return image
+        return self._get((gid, flip_x, flip_y, False, rotation, size), build)
+
+    # Đăng ký một sprite sheet có sẵn (ví dụ ảnh thay thế khi không tải được file)
+    def add_sheet(self, name, surface):
+        self.sheets[name] = surface
+
+    def sheet(self, name):
+        surface = self.sheets.get(name)
+        if surface is None:
+            surface = pygame.image.load(name)
+            if pygame.display.get_surface():
+                surface = surface.convert_alpha()
+            self.sheets[name] = surface
+        return surface
+
+    # Khung hình (row, col) của sprite sheet name chia rows x cols, phóng to thành size
+    def sprite(self, name, row, col, rows, cols, size):
+        def build():
+            sheet = self.sheet(name)
+            width = sheet.get_width() // cols
+            height = sheet.get_height() // rows
+            frame = sheet.subsurface(pygame.Rect(col * width, row * height, width, height))
+            return pygame.transform.scale(frame, size)
+        return self._get((name, row, col, rows, cols, size), build)
@@ -0,0 +1,96 @@
+import argparse
+import multiprocessing
+import os
+import time
+
+from adversarial import EXPECTIMAX, MINIMAX
+from level import load_level
+from levels import resolve_maps
+from simulation import (CAUGHT, ESCAPED, MASTER_VISION_RANGE, MAX_TICKS, THIEF_VISION_RANGE,
+                        TIMEOUT, Simulation, World)
+
+# Level và dữ liệu tĩnh (World) trong mỗi tiến trình con: mỗi tiến trình chỉ tính một lần
+_worlds = {}
+
+
+def _get_world(path, params):
+    key = (path, params.get("thief_vision_range", THIEF_VISION_RANGE),
+           params.get("master_vision_range", MASTER_VISION_RANGE))
+    if key not in _worlds:
+        _worlds[key] = World(load_level(path), key[1], key[2])
+    return _worlds[key]
+
+
+# Chạy một ván không giao diện; trả về (bản đồ, seed, kết quả, số bước)
+def run_episode(job):
+    map_path, seed, params = job
+    world = _get_world(map_path, params)
+    sim = Simulation(world.level, seed=seed, world=world, **params)
+    result, ticks = sim.run()
+    return map_path, seed, result, ticks
+
+
+def run_batch(map_paths, episodes, seed=0, workers=None, params=None, chunksize=16):
+    params = params or {}
+    # Biên dịch level trước trong tiến trình chính để các tiến trình con chỉ đọc cache
+    for path in map_paths:
+        load_level(path)
+    jobs = [(path, seed + i, params) for path in map_paths for i in range(episodes)]
+    stats = {path: {ESCAPED: 0, CAUGHT: 0, TIMEOUT: 0, "ticks": []} for path in map_paths}
+
+    start = time.perf_counter()
+    if workers == 1:
+        results = map(run_episode, jobs)
+        for map_path, _, result, ticks in results:
+            stats[map_path][result] += 1
+            stats[map_path]["ticks"].append(ticks)
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            for map_path, _, result, ticks in pool.imap_unordered(run_episode, jobs, chunksize):
+                stats[map_path][result] += 1
+                stats[map_path]["ticks"].append(ticks)
+    elapsed = time.perf_counter() - start
+    return stats, elapsed, len(jobs)
+
+
+def print_report(stats, elapsed, total):
+    print(f"{'map':<14}{'episodes':>9}{'escape':>9}{'caught':>9}{'timeout':>9}{'mean steps':>12}")
+    for path, s in stats.items():
+        n = len(s["ticks"])
+        if n == 0:
+            continue
+        print(f"{os.path.basename(path):<14}{n:>9}"
+              f"{s[ESCAPED] / n:>9.1%}{s[CAUGHT] / n:>9.1%}{s[TIMEOUT] / n:>9.1%}"
+              f"{sum(s['ticks']) / n:>12.1f}")
+    print(f"{total} episodes in {elapsed:.2f}s ({total / elapsed:.1f} episodes/s)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Chạy hàng loạt ván không giao diện để đánh giá AI trộm/ông chủ")
+    parser.add_argument("maps", nargs="*", help="tên bản đồ (1-5), file .tmx hoặc thư mục; mặc định mọi bản đồ trong map/")
+    parser.add_argument("-n", "--episodes", type=int, default=100, help="số ván cho mỗi bản đồ")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="số tiến trình (mặc định: số CPU)")
+    parser.add_argument("--seed", type=int, default=0, help="seed của ván đầu tiên, các ván sau tăng dần")
+    parser.add_argument("--max-ticks", type=int, default=MAX_TICKS)
+    parser.add_argument("--thief-vision-range", type=int, default=THIEF_VISION_RANGE)
+    parser.add_argument("--master-vision-range", type=int, default=MASTER_VISION_RANGE)
+    parser.add_argument("--guards", type=int, default=None, help="số ông chủ (mặc định: theo bản đồ)")
+    parser.add_argument("--predictive", choices=(MINIMAX, EXPECTIMAX), default=None,
+                        help="ông chủ đang đuổi bắt đoán trước nước đi của trộm")
+    parser.add_argument("--risk-aware", action="store_true", help="nhân vật trộm tránh tầm nhìn của ông chủ")
+    args = parser.parse_args(argv)
+
+    params = {
+        "max_ticks": args.max_ticks,
+        "thief_vision_range": args.thief_vision_range,
+        "master_vision_range": args.master_vision_range,
+        "guards": args.guards,
+        "predictive": args.predictive,
+        "risk_aware": args.risk_aware,
+    }
+    stats, elapsed, total = run_batch(resolve_maps(args.maps), args.episodes, args.seed, args.workers, params)
+    print_report(stats, elapsed, total)
+
+
+if __name__ == "__main__":
+    main()
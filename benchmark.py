@@ -0,0 +1,369 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+from flowfield import FlowField, FlowFieldCache, free_mask
+from level import FurnitureObject, Level, load_level
+from pathfinding import IncrementalPlanner, build_neighbors
+from route import RoutePlanner
+from simulation import Simulation, World
+from vecenv import VectorEnv
+from vision import VisionSystem
+from walkability import WalkGrid
+
+BUNDLED_MAPS = ["map/%d.tmx" % i for i in range(1, 6)]
+SYNTHETIC_SIZES = [128, 512]
+BASELINE_PATH = "bench_baseline.json"
+DIRECTIONS = ["up", "down", "left", "right"]
+
+
+# Bản đồ tổng hợp kích thước rows x cols: tường bao quanh, tường ngẫu nhiên và đồ nội thất ngẫu nhiên
+def make_synthetic_level(rows, cols, seed=0, wall_density=0.1, furniture_density=0.02, tile_size=8):
+    rng = random.Random(seed)
+    wall_grid = [[0 for _ in range(cols)] for _ in range(rows)]
+    for r in range(rows):
+        for c in range(cols):
+            if r in (0, rows - 1) or c in (0, cols - 1) or rng.random() < wall_density:
+                wall_grid[r][c] = 1
+    furniture = []
+    for i in range(int(rows * cols * furniture_density)):
+        width = rng.uniform(0.5, 3) * tile_size
+        height = rng.uniform(0.5, 3) * tile_size
+        x = rng.uniform(0, cols * tile_size - width)
+        y = rng.uniform(0, rows * tile_size - height)
+        furniture.append(FurnitureObject(i + 1, 0, x, y, width, height))
+    return Level("synthetic-%dx%d" % (rows, cols), rows, cols, tile_size, tile_size, [], wall_grid,
+                 furniture, None, [], [], None, {})
+
+
+def _free_cells(walk_grid):
+    return [[r, c] for r in range(walk_grid.rows) for c in range(walk_grid.cols) if walk_grid.is_free(r, c)]
+
+
+# Đo thời gian (lấy lần nhanh nhất trong repeat lần để giảm nhiễu) và bộ nhớ đỉnh của fn()
+# (chạy thêm một lần với tracemalloc vì tracemalloc làm chậm đáng kể)
+def measure(fn, repeat=3):
+    elapsed = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        extra = fn()
+        duration = time.perf_counter() - start
+        elapsed = duration if elapsed is None else min(elapsed, duration)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    result = {"wall_time": elapsed, "peak_kb": peak / 1024}
+    if extra:
+        result.update(extra)
+    return result
+
+
+def bench_walk_grid(level):
+    cell = level.tile_width
+
+    def run():
+        WalkGrid(level.wall_grid, level.furniture_rects(), cell, cell)
+    return measure(run)
+
+
+# Một nhân vật đi tới đích, mỗi bước lập lại đường đi vòng qua vài chướng ngại di động: D* Lite
+# chỉ sửa phần đường bị ảnh hưởng; "dstar_fresh_per_step" tìm lại từ đầu mỗi bước để so sánh
+def bench_incremental(walk_grid, steps, obstacles, rng, incremental=True):
+    free = _free_cells(walk_grid)
+    start, goal = rng.choice(free), rng.choice(free)
+    # Chướng ngại đi qua lại giữa hai ô ngẫu nhiên, vị trí ở mỗi bước tính trước
+    movers = [[rng.choice(free) for _ in range(2)] for _ in range(obstacles)]
+    blocked = [[pair[(t // 8) % 2] for pair in movers] for t in range(steps)]
+    neighbors = build_neighbors(walk_grid)
+
+    def run():
+        planner = IncrementalPlanner(walk_grid, neighbors)
+        pos, expanded, ticks = start, 0, 0
+        for t in range(steps):
+            if pos == goal:
+                break
+            if not incremental:
+                planner = IncrementalPlanner(walk_grid, neighbors)
+            path = planner.plan(pos, goal, blocked[t])
+            expanded += planner.nodes_expanded
+            ticks += 1
+            if not path or len(path) < 2:
+                break
+            if path[1] not in blocked[t]:
+                pos = path[1]
+        return {"steps": ticks, "nodes_expanded": expanded / max(ticks, 1)}
+    result = measure(run)
+    result["per_tick_ms"] = result["wall_time"] / max(result["steps"], 1) * 1e3
+    return result
+
+
+# Tính trường khoảng cách cho vài đích, sau đó đọc bước tiếp theo cho nhiều nhân vật
+def bench_flow_field(walk_grid, goals, lookups, rng):
+    free_cells = _free_cells(walk_grid)
+    free = free_mask(walk_grid)
+    targets = [rng.choice(free_cells) for _ in range(goals)]
+    agents = [rng.choice(free_cells) for _ in range(lookups)]
+
+    def run():
+        for goal in targets:
+            field = FlowField(free, goal)
+            for pos in agents:
+                field.next_step(pos)
+        return {"fields": len(targets)}
+    result = measure(run)
+    result["per_field_ms"] = result["wall_time"] / len(targets) * 1e3
+    return result
+
+
+# Lập thứ tự nhặt count vật phẩm (gồm cả tính ma trận khoảng cách từ trường khoảng cách)
+def bench_route(walk_grid, count, rng):
+    free_cells = _free_cells(walk_grid)
+    start, exit_pos = rng.choice(free_cells), rng.choice(free_cells)
+    items = [rng.choice(free_cells) for _ in range(count)]
+
+    def run():
+        planner = RoutePlanner(FlowFieldCache(walk_grid, count + 1))
+        planner.plan(start, items, exit_pos)
+        return {"items": count}
+    return measure(run)
+
+
+# Chạy một ván với nhiều ông chủ trong tối đa ticks bước (World dùng chung giữa các lần chạy)
+def bench_guards(world, guards, ticks, seed, risk_aware=False):
+    def run():
+        sim = Simulation(world.level, seed=seed, world=world, guards=guards, max_ticks=ticks,
+                         risk_aware=risk_aware)
+        sim.run()
+        return {"ticks": sim.tick, "searches": sim.cooperative.searches}
+    result = measure(run)
+    result["per_tick_ms"] = result["wall_time"] / result["ticks"] * 1e3
+    return result
+
+
+# Môi trường vector hoá: num_envs ván chạy song song trong steps bước (ván kết thúc tự đặt lại)
+def bench_vector_env(world, num_envs, steps, seed):
+    env = VectorEnv(world.level, num_envs, seed=seed, world=world)
+
+    def run():
+        episodes = 0
+        for _ in range(steps):
+            _, _, done, _ = env.step()
+            episodes += int(done.sum())
+        return {"env_steps": num_envs * steps, "episodes": episodes}
+    result = measure(run)
+    result["steps_per_s"] = result["env_steps"] / result["wall_time"]
+    return result
+
+
+def bench_nearest_free(walk_grid, queries, rng):
+    cells = [[rng.randrange(walk_grid.rows), rng.randrange(walk_grid.cols)] for _ in range(queries)]
+
+    def run():
+        for cell in cells:
+            walk_grid.nearest_free(cell)
+        return {"queries": len(cells)}
+    result = measure(run)
+    result["per_query_us"] = result["wall_time"] / len(cells) * 1e6
+    return result
+
+
+def bench_vision(level, walk_grid, queries, rng, kind):
+    free = _free_cells(walk_grid)
+    cells = [(rng.choice(free), rng.choice(free), rng.choice(DIRECTIONS)) for _ in range(queries)]
+    vision = VisionSystem(level.wall_grid)
+    if kind == "thief":
+        def run():
+            for pos, _, direction in cells:
+                vision.thief_zone(pos, direction)
+            return {"queries": len(cells)}
+    elif kind == "master":
+        def run():
+            for pos, _, _ in cells:
+                vision.master_zone(pos)
+            return {"queries": len(cells)}
+    else:
+        def run():
+            for a, b, _ in cells:
+                vision.can_see(a, b)
+            return {"queries": len(cells)}
+    # Lần đầu (cache trống) gồm cả shadowcasting; các lần sau chỉ tra cache
+    start = time.perf_counter()
+    run()
+    cold = time.perf_counter() - start
+    result = measure(run)
+    result["per_query_us"] = result["wall_time"] / len(cells) * 1e6
+    result["cold_per_query_us"] = cold / len(cells) * 1e6
+    return result
+
+
+# Đo tốc độ vẽ khung hình bằng MapRenderer (nền tĩnh + vùng bẩn) với SDL dummy
+def bench_render(level, walk_grid, frames, rng, screen_size=(1200, 800)):
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import pygame
+    from renderer import MapRenderer
+
+    pygame.init()
+    screen = pygame.display.set_mode(screen_size)
+    map_width = level.cols * level.tile_width
+    map_height = level.rows * level.tile_height
+    scale = min(screen_size[0] / map_width, screen_size[1] / map_height)
+    offset = ((screen_size[0] - map_width * scale) // 2, (screen_size[1] - map_height * scale) // 2)
+
+    build_start = time.perf_counter()
+    renderer = MapRenderer(level, screen_size, scale, offset, (128, 128, 128))
+    build_time = time.perf_counter() - build_start
+
+    cell = max(1, int(renderer.scaled_grid_size))
+    sprite = pygame.Surface((cell, cell))
+    sprite.fill((0, 0, 255))
+    free = _free_cells(walk_grid)
+    positions = [(rng.choice(free), rng.choice(free), rng.choice(DIRECTIONS)) for _ in range(frames)]
+    vision = VisionSystem(level.wall_grid)
+
+    def run():
+        renderer.invalidate()
+        for thief, master, direction in positions:
+            renderer.begin_frame(screen)
+            renderer.draw_cell_outlines(screen, (135, 206, 250), vision.thief_zone(thief, direction))
+            renderer.draw_cell_outlines(screen, (147, 112, 219), vision.master_zone(master))
+            renderer.blit(screen, sprite, renderer.cell_rect(thief).topleft)
+            renderer.blit(screen, sprite, renderer.cell_rect(master).topleft)
+            renderer.end_frame()
+        return {"frames": len(positions)}
+    result = measure(run)
+    result["fps"] = len(positions) / result["wall_time"]
+    result["build_time"] = build_time
+    pygame.quit()
+    return result
+
+
+# Vẽ khung hình đầy đủ (bản đồ, vùng tầm nhìn, nhân vật, dòng trạng thái) vào surface ngoài
+# màn hình bằng OffscreenRenderer, không cần cửa sổ hay SDL dummy
+def bench_offscreen(level, walk_grid, frames, rng, size=(1200, 800)):
+    import pygame
+    from headless import OffscreenRenderer
+    from replay import ReplayState
+
+    pygame.font.init()
+    build_start = time.perf_counter()
+    renderer = OffscreenRenderer(level, VisionSystem(level.wall_grid), size)
+    build_time = time.perf_counter() - build_start
+
+    free = _free_cells(walk_grid)
+    states = [ReplayState(i, rng.choice(free), [rng.choice(free)], [], rng.choice(DIRECTIONS), 0)
+              for i in range(frames + 1)]
+
+    def run():
+        for prev, state in zip(states, states[1:]):
+            renderer.render(state, prev, 0.5)
+        return {"frames": frames}
+    result = measure(run)
+    result["fps"] = frames / result["wall_time"]
+    result["build_time"] = build_time
+    return result
+
+
+def run_suite(maps, sizes, seed=0, render=True):
+    results = {}
+    targets = [(os.path.basename(path), load_level(path)) for path in maps]
+    targets += [("synthetic-%d" % n, make_synthetic_level(n, n, seed)) for n in sizes]
+    for name, level in targets:
+        rng = random.Random(seed)
+        cell = level.tile_width
+        walk_grid = WalkGrid(level.wall_grid, level.furniture_rects(), cell, cell)
+        big = level.rows * level.cols > 100000
+        suite = {
+            "walk_grid_build": bench_walk_grid(level),
+            "dstar_replan": bench_incremental(walk_grid, 100 if big else 300, 4, random.Random(seed)),
+            "dstar_fresh_per_step": bench_incremental(walk_grid, 100 if big else 300, 4, random.Random(seed), False),
+            "flow_field": bench_flow_field(walk_grid, 3 if big else 20, 1000, rng),
+            "route_plan_exact": bench_route(walk_grid, 8, rng),
+            "route_plan_heuristic": bench_route(walk_grid, 20, rng),
+            "find_nearest_free_position": bench_nearest_free(walk_grid, 10000, rng),
+            "thief_vision_zone": bench_vision(level, walk_grid, 2000, rng, "thief"),
+            "master_vision_zone": bench_vision(level, walk_grid, 2000, rng, "master"),
+            "can_see": bench_vision(level, walk_grid, 2000, rng, "can_see"),
+        }
+        world = World(level)
+        for guards in (1, 32):
+            suite["guards_%d" % guards] = bench_guards(world, guards, 100 if big else 300, seed)
+        suite["guards_32_risk_aware"] = bench_guards(world, 32, 100 if big else 300, seed, risk_aware=True)
+        if not big:
+            suite["vector_env_1024"] = bench_vector_env(world, 1024, 200, seed)
+        if render:
+            suite["draw_map"] = bench_render(level, walk_grid, 60 if big else 200, rng)
+            suite["draw_frame_offscreen"] = bench_offscreen(level, walk_grid, 60 if big else 200, rng)
+        results[name] = suite
+        print_suite(name, suite)
+    return results
+
+
+def _format(metrics):
+    parts = []
+    units = {"per_query_us": "us/query", "per_field_ms": "ms/field", "per_tick_ms": "ms/tick",
+             "steps_per_s": "steps/s", "cold_per_query_us": "us/query cold", "nodes_expanded": "nodes",
+             "fps": "fps", "wall_time": "s", "peak_kb": "KiB peak"}
+    for key, unit in units.items():
+        if key in metrics:
+            parts.append("%.3f %s" % (metrics[key], unit) if key == "wall_time" else "%.1f %s" % (metrics[key], unit))
+    return ", ".join(parts)
+
+
+def print_suite(name, suite):
+    print(name)
+    for bench, metrics in suite.items():
+        print("  %-28s %s" % (bench, _format(metrics)))
+
+
+# So sánh với baseline: chỉ số thời gian tăng quá threshold (hoặc fps giảm) bị coi là hồi quy
+def compare(results, baseline, threshold):
+    regressions = []
+    for name, suite in results.items():
+        for bench, metrics in suite.items():
+            base = baseline.get(name, {}).get(bench)
+            if not base:
+                continue
+            if "fps" in metrics and base.get("fps"):
+                ratio = base["fps"] / metrics["fps"]
+            else:
+                ratio = metrics["wall_time"] / base["wall_time"] if base["wall_time"] else 1.0
+            flag = "REGRESSION" if ratio > 1 + threshold else ""
+            print("  %-16s %-28s %6.2fx %s" % (name, bench, ratio, flag))
+            if flag:
+                regressions.append((name, bench, ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark tìm đường, tầm nhìn và vẽ bản đồ")
+    parser.add_argument("--maps", nargs="*", default=BUNDLED_MAPS, help="các file .tmx cần đo")
+    parser.add_argument("--sizes", nargs="*", type=int, default=SYNTHETIC_SIZES,
+                        help="kích thước bản đồ tổng hợp (n x n)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-render", action="store_true", help="bỏ qua benchmark vẽ")
+    parser.add_argument("--save", nargs="?", const=BASELINE_PATH, help="lưu kết quả làm baseline")
+    parser.add_argument("--compare", nargs="?", const=BASELINE_PATH, help="so sánh với baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="ngưỡng hồi quy (0.2 = chậm hơn 20%%)")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.maps, args.sizes, args.seed, render=not args.no_render)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+        print("baseline saved to %s" % args.save)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print("compared with %s" % args.compare)
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
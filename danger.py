@@ -0,0 +1,74 @@
+# Chi phí thêm khi đi vào ô đang nằm trong tầm nhìn của một ông chủ; sau khi ông chủ đi khỏi,
+# chi phí giảm một nửa sau mỗi DANGER_HALF_LIFE bước cho tới 0
+DANGER_PEAK = 32
+DANGER_HALF_LIFE = 8
+
+
+# Bản đồ nguy hiểm: số ông chủ đang nhìn thấy mỗi ô (cập nhật theo phần chênh lệch giữa zone
+# cũ và zone mới khi ông chủ di chuyển) và bước cuối cùng ô còn bị nhìn thấy. cost[id ô] = 1 +
+# mức nguy hiểm; mức này chỉ đổi ở các bước đã hẹn trước (lúc ô bị nhìn thấy hoặc hết bị nhìn
+# thấy và mỗi nửa chu kỳ sau đó) nên mỗi bước chỉ xét các ô thật sự đổi, không dựng lại cả bản đồ.
+class DangerMap:
+    def __init__(self, vision, rows, cols, peak=DANGER_PEAK, half_life=DANGER_HALF_LIFE):
+        self.vision = vision
+        self.cols = cols
+        self.peak = peak
+        self.half_life = half_life
+        self.watchers = [0] * (rows * cols)  # Số ông chủ đang nhìn thấy ô
+        self.left = {}  # id ô -> bước ô hết bị nhìn thấy (đang phân rã)
+        self.cost = [1] * (rows * cols)
+        self.zones = {}  # chỉ số ông chủ -> zone tầm nhìn đã tính vào watchers
+        self._decay = {}  # bước -> [(id ô, bước hết bị nhìn thấy)] cần xét lại ở bước đó
+        self.tick = 0
+
+    def _level(self, cell):
+        if self.watchers[cell]:
+            return self.peak
+        left = self.left.get(cell)
+        if left is None:
+            return 0
+        shift = (self.tick - left) // self.half_life
+        return self.peak >> shift if shift < self.peak.bit_length() else 0
+
+    # Cập nhật theo vị trí các ông chủ tại bước tick; trả về các id ô có chi phí đổi
+    def update(self, positions, tick):
+        self.tick = tick
+        touched = set()
+        cols = self.cols
+        for index, pos in enumerate(positions):
+            zone = self.vision.master_zone(pos)
+            old = self.zones.get(index)
+            if old is zone:
+                continue
+            self.zones[index] = zone
+            if old is not None:
+                for r, c in old - zone:
+                    cell = r * cols + c
+                    self.watchers[cell] -= 1
+                    if not self.watchers[cell]:
+                        self.left[cell] = tick
+                        self._decay.setdefault(tick + self.half_life, []).append((cell, tick))
+                        touched.add(cell)
+                added = zone - old
+            else:
+                added = zone
+            for r, c in added:
+                cell = r * cols + c
+                self.watchers[cell] += 1
+                touched.add(cell)
+        for cell, left in self._decay.pop(tick, ()):
+            if self.left.get(cell) != left or self.watchers[cell]:
+                continue  # Ô đã bị nhìn thấy lại sau đó
+            touched.add(cell)
+            if self._level(cell):
+                self._decay.setdefault(tick + self.half_life, []).append((cell, left))
+            else:
+                del self.left[cell]
+        changed = []
+        for cell in touched:
+            cost = 1 + self._level(cell)
+            if cost != self.cost[cell]:
+                self.cost[cell] = cost
+                changed.append(cell)
+        return changed
+
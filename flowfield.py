@@ -0,0 +1,138 @@
+from collections import OrderedDict
+
+import numpy as np
+
+from scheduler import run_job
+from walkability import DIRECTIONS
+
+# Khoảng cách của ô không tới được đích
+UNREACHABLE = np.iinfo(np.int32).max
+
+# Số trường khoảng cách giữ trong cache cho mỗi lưới (mỗi đích một trường)
+FIELD_CACHE_SIZE = 8
+
+# Số vòng mở rộng mặt sóng giữa hai lần nhường khi tính trường khoảng cách như một tác vụ
+WAVES_PER_YIELD = 16
+
+
+# Ma trận ô đi được (True = trống) của một WalkGrid
+def free_mask(walk_grid):
+    blocked = np.frombuffer(bytes(walk_grid.blocked), dtype=np.uint8)
+    return (blocked == 0).reshape(walk_grid.rows, walk_grid.cols)
+
+
+# BFS vector hoá: mỗi vòng lặp mở rộng cả mặt sóng bằng phép dịch mảng
+def distance_field(free, goal):
+    return run_job(distance_field_job(free, goal))
+
+
+# distance_field dạng tác vụ cho JobScheduler: nhường sau mỗi WAVES_PER_YIELD vòng
+def distance_field_job(free, goal):
+    rows, cols = free.shape
+    dist = np.full((rows, cols), UNREACHABLE, dtype=np.int32)
+    r, c = goal
+    if not (0 <= r < rows and 0 <= c < cols) or not free[r, c]:
+        return dist
+    dist[r, c] = 0
+    frontier = np.zeros((rows, cols), dtype=bool)
+    frontier[r, c] = True
+    unvisited = free.copy()
+    unvisited[r, c] = False
+    nxt = np.empty_like(frontier)
+    d = 0
+    while True:
+        d += 1
+        nxt.fill(False)
+        nxt[1:, :] |= frontier[:-1, :]
+        nxt[:-1, :] |= frontier[1:, :]
+        nxt[:, 1:] |= frontier[:, :-1]
+        nxt[:, :-1] |= frontier[:, 1:]
+        nxt &= unvisited
+        if not nxt.any():
+            break
+        dist[nxt] = d
+        unvisited &= ~nxt
+        frontier, nxt = nxt, frontier
+        if d % WAVES_PER_YIELD == 0:
+            yield
+    return dist
+
+
+# Hướng đi xuống dốc của trường khoảng cách cho mọi ô (chỉ số trong DIRECTIONS, -1 = đứng yên)
+def descent_directions(dist):
+    rows, cols = dist.shape
+    padded = np.full((rows + 2, cols + 2), UNREACHABLE, dtype=np.int32)
+    padded[1:-1, 1:-1] = dist
+    neighbors = np.stack([padded[1 + dr:rows + 1 + dr, 1 + dc:cols + 1 + dc] for dr, dc in DIRECTIONS])
+    best = neighbors.argmin(axis=0)
+    best_dist = neighbors.min(axis=0)
+    return np.where(best_dist < dist, best, -1).astype(np.int8)
+
+
+# Trường khoảng cách tới một đích: mọi nhân vật đọc bước tiếp theo trong O(1)
+class FlowField:
+    def __init__(self, free, goal, dist=None):
+        self.goal = list(goal)
+        self.dist = distance_field(free, goal) if dist is None else dist
+        self.direction = descent_directions(self.dist)
+        self.rows, self.cols = free.shape
+
+    # Khoảng cách (số bước) từ pos tới đích, None nếu không tới được
+    def distance(self, pos):
+        d = int(self.dist[pos[0], pos[1]])
+        return None if d == UNREACHABLE else d
+
+    # Ô tiếp theo trên đường ngắn nhất từ pos, None nếu đã tới đích hoặc không tới được
+    def next_step(self, pos):
+        k = self.direction[pos[0], pos[1]]
+        if k < 0:
+            return None
+        dr, dc = DIRECTIONS[k]
+        return [pos[0] + dr, pos[1] + dc]
+
+    # Toàn bộ đường đi từ start tới đích (gồm cả start) theo hướng xuống dốc
+    def path(self, start):
+        path = [list(start)]
+        step = self.next_step(start)
+        while step is not None:
+            path.append(step)
+            step = self.next_step(step)
+        return path if path[-1] == self.goal else None
+
+
+# Cache trường khoảng cách theo đích cho một WalkGrid: chỉ tính lại khi đích đổi
+class FlowFieldCache:
+    def __init__(self, walk_grid, capacity=FIELD_CACHE_SIZE):
+        self.free = free_mask(walk_grid)
+        self.capacity = capacity
+        self.fields = OrderedDict()
+        self.computed = 0  # Số trường đã tính (để đo)
+
+    def get(self, goal):
+        field = self.cached(goal)
+        if field is None:
+            field = self._store(FlowField(self.free, goal))
+        return field
+
+    # Trường đã có trong cache (None nếu chưa tính)
+    def cached(self, goal):
+        key = (goal[0], goal[1])
+        field = self.fields.get(key)
+        if field is not None:
+            self.fields.move_to_end(key)
+        return field
+
+    # get() dạng tác vụ cho JobScheduler
+    def job(self, goal):
+        field = self.cached(goal)
+        if field is None:
+            dist = yield from distance_field_job(self.free, goal)
+            field = self._store(FlowField(self.free, goal, dist))
+        return field
+
+    def _store(self, field):
+        self.computed += 1
+        self.fields[(field.goal[0], field.goal[1])] = field
+        if len(self.fields) > self.capacity:
+            self.fields.popitem(last=False)
+        return field
@@ -0,0 +1,195 @@
+import heapq
+
+from flowfield import UNREACHABLE
+from pathfinding import build_neighbors
+
+# Kích thước một ô của spatial hash (tính theo số ô bản đồ)
+BUCKET_SIZE = 8
+
+# Cửa sổ thời gian của cooperative A* (WHCA*): số bước được đặt chỗ trước cho mỗi ông chủ;
+# đường đi được lập lại sau nửa cửa sổ
+WINDOW = 8
+
+
+# Một ông chủ (lính gác): vị trí, trạng thái tuần tra/đuổi bắt và các bước đã đặt chỗ
+class Guard:
+    def __init__(self, index, pos):
+        self.index = index
+        self.pos = pos
+        self.circuit = None  # Vòng tuần tra đang đi (danh sách chỉ số điểm tuần tra), None = chưa vào vòng
+        self.circuit_index = 0
+        self.circuit_step = 1
+        self.field = None  # Trường khoảng cách tới đích hiện tại (điểm tuần tra hoặc trộm)
+        self.chasing = False
+        self.plan = []  # Các ô đã đặt chỗ, plan[k] là vị trí tại bước plan_tick + k
+        self.plan_tick = 0
+
+
+# Băm không gian theo khối BUCKET_SIZE x BUCKET_SIZE ô: truy vấn các agent gần một ô
+# chỉ duyệt vài khối lân cận thay vì mọi agent
+class SpatialHash:
+    def __init__(self, bucket_size=BUCKET_SIZE):
+        self.bucket_size = bucket_size
+        self.buckets = {}  # (khối hàng, khối cột) -> {agent}
+        self.positions = {}  # agent -> (hàng, cột)
+
+    def _key(self, pos):
+        return pos[0] // self.bucket_size, pos[1] // self.bucket_size
+
+    def insert(self, agent, pos):
+        pos = (pos[0], pos[1])
+        self.positions[agent] = pos
+        self.buckets.setdefault(self._key(pos), set()).add(agent)
+
+    def remove(self, agent):
+        key = self._key(self.positions.pop(agent))
+        bucket = self.buckets[key]
+        bucket.discard(agent)
+        if not bucket:
+            del self.buckets[key]
+
+    def move(self, agent, pos):
+        old = self.positions.get(agent)
+        if old is not None and self._key(old) == self._key(pos):
+            self.positions[agent] = (pos[0], pos[1])
+            return
+        if old is not None:
+            self.remove(agent)
+        self.insert(agent, pos)
+
+    # Các agent có khoảng cách Manhattan tới pos không quá radius (sắp xếp để kết quả tất định)
+    def near(self, pos, radius):
+        b = self.bucket_size
+        row, col = pos
+        found = []
+        for br in range((row - radius) // b, (row + radius) // b + 1):
+            for bc in range((col - radius) // b, (col + radius) // b + 1):
+                bucket = self.buckets.get((br, bc))
+                if not bucket:
+                    continue
+                for agent in bucket:
+                    r, c = self.positions[agent]
+                    if abs(r - row) + abs(c - col) <= radius:
+                        found.append(agent)
+        found.sort()
+        return found
+
+    def at(self, pos):
+        return self.near(pos, 0)
+
+
+# Bảng đặt chỗ không gian-thời gian: (ô, bước) và (cạnh, bước) đã được agent nào giữ.
+# Khoá là số nguyên: ô = bước * n + id, cạnh = (bước * n + id đi) * n + id tới
+class ReservationTable:
+    def __init__(self, size):
+        self.size = size
+        self.cells = {}
+        self.edges = {}
+        self.owned = {}  # agent -> ([khoá ô], [khoá cạnh]) để huỷ nhanh
+
+    def cell_taken(self, cell_id, t, agent):
+        other = self.cells.get(t * self.size + cell_id)
+        return other is not None and other != agent
+
+    # Có agent khác đi ngược chiều trên cạnh a -> b trong bước t (hai agent đổi chỗ cho nhau)
+    def swap_taken(self, a, b, t, agent):
+        other = self.edges.get((t * self.size + b) * self.size + a)
+        return other is not None and other != agent
+
+    # Đặt chỗ đường đi path (id ô) bắt đầu tại bước t0
+    def reserve(self, agent, path, t0):
+        n = self.size
+        cells, edges = self.owned.setdefault(agent, ([], []))
+        for k, cell_id in enumerate(path):
+            key = (t0 + k) * n + cell_id
+            self.cells[key] = agent
+            cells.append(key)
+            if k and path[k - 1] != cell_id:
+                key = ((t0 + k - 1) * n + path[k - 1]) * n + cell_id
+                self.edges[key] = agent
+                edges.append(key)
+
+    def release(self, agent):
+        owned = self.owned.pop(agent, None)
+        if owned is None:
+            return
+        cells, edges = owned
+        for key in cells:
+            if self.cells.get(key) == agent:
+                del self.cells[key]
+        for key in edges:
+            if self.edges.get(key) == agent:
+                del self.edges[key]
+
+
+# Cooperative A* có cửa sổ (WHCA*): tìm đường trong không gian-thời gian (đi 4 hướng hoặc
+# đứng chờ) tránh các ô/cạnh đã được agent khác đặt chỗ, chỉ trong window bước đầu.
+# Heuristic là khoảng cách thật trên trường khoảng cách tới đích (bỏ qua agent khác),
+# nên với một agent đường đi trùng đường ngắn nhất và mỗi lần tìm chỉ mở rộng vài nút.
+class CooperativePlanner:
+    def __init__(self, walk_grid, window=WINDOW, neighbors=None):
+        self.rows, self.cols = walk_grid.rows, walk_grid.cols
+        self.size = self.rows * self.cols
+        self.neighbors = neighbors if neighbors is not None else build_neighbors(walk_grid)
+        self.window = window
+        self.table = ReservationTable(self.size)
+        self.searches = 0  # Số lần tìm (để đo)
+        self.nodes_expanded = 0
+
+    # Lập và đặt chỗ đường đi window bước cho agent từ start tại bước t0 theo trường field;
+    # trả về danh sách ô [[hàng, cột], ...] (phần tử đầu là start)
+    def plan(self, agent, start, field, t0):
+        table = self.table
+        table.release(agent)
+        self.searches += 1
+        n, cols, window = self.size, self.cols, self.window
+        h = field.dist.reshape(-1)
+        start_id = start[0] * cols + start[1]
+        if h[start_id] == UNREACHABLE:
+            path = [start_id]
+        else:
+            path = self._search(agent, start_id, h, t0, n, window)
+        table.reserve(agent, path, t0)
+        return [list(divmod(i, cols)) for i in path]
+
+    def _search(self, agent, start_id, h, t0, n, window):
+        table = self.table
+        neighbors = self.neighbors
+        start_key = start_id  # Khoá trạng thái = k * n + id ô (k = số bước từ t0)
+        parent = {start_key: None}
+        heap = [(int(h[start_id]), 0, start_id)]  # (f, -k, id): cùng f thì ưu tiên trạng thái sâu hơn
+        expanded = 0
+        best = start_key
+        at_goal = False
+        while heap:
+            f, k, i = heapq.heappop(heap)
+            k = -k
+            key = k * n + i
+            expanded += 1
+            # Hết cửa sổ hoặc tới đích và có thể đứng yên tới hết cửa sổ
+            if k == window or (h[i] == 0 and not any(table.cell_taken(i, t0 + j, agent)
+                                                     for j in range(k + 1, window + 1))):
+                best = key
+                at_goal = k < window
+                break
+            t = t0 + k
+            for j in neighbors[i] + (i,):
+                nkey = (k + 1) * n + j
+                if nkey in parent or h[j] == UNREACHABLE:
+                    continue
+                if table.cell_taken(j, t + 1, agent) or (j != i and table.swap_taken(i, j, t, agent)):
+                    continue
+                parent[nkey] = key
+                heapq.heappush(heap, (k + 1 + int(h[j]), -k - 1, j))
+        self.nodes_expanded += expanded
+
+        path = []
+        key = best
+        while key is not None:
+            path.append(key % n)
+            key = parent[key]
+        path.reverse()
+        if at_goal:
+            # Giữ chỗ đứng tại đích tới hết cửa sổ để agent khác không đi xuyên qua
+            path.extend([path[-1]] * (window + 1 - len(path)))
+        return path
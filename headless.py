@@ -0,0 +1,217 @@
+import argparse
+import itertools
+import os
+import sys
+import time
+from collections import deque
+
+import pygame
+
+from instrumentation import Profiler
+from level import load_level
+from replay import Replay, ReplayPlayer, ReplayState, map_hash
+from simulation import MASTER_VISION_RANGE, MAX_TICKS, THIEF_VISION_RANGE, Simulation, World
+from view import GameView
+from vision import VisionSystem
+
+DEFAULT_SIZE = "1200x800"
+PNG_PATTERN = "frame_%05d.png"
+
+# Surface khung hình 32 bit với các byte trong bộ nhớ theo thứ tự R, G, B, X trên mọi máy: bộ đệm
+# thô ghi thẳng ra file đọc được bằng ffmpeg -f rawvideo -pix_fmt rgb0
+if sys.byteorder == "little":
+    RGBX_MASKS = (0x000000FF, 0x0000FF00, 0x00FF0000, 0)
+else:
+    RGBX_MASKS = (0xFF000000, 0x00FF0000, 0x0000FF00, 0)
+
+
+# "640x360" -> (640, 360)
+def parse_size(text):
+    width, _, height = text.lower().partition("x")
+    try:
+        size = int(width), int(height)
+    except ValueError:
+        raise argparse.ArgumentTypeError("size must look like 640x360")
+    if min(size) <= 0:
+        raise argparse.ArgumentTypeError("size must be positive")
+    return size
+
+
+# Vẽ khung hình ngoài màn hình (không cần cửa sổ) ở kích thước bất kỳ bằng cùng GameView với main.py.
+# Surface được giữ qua các khung hình nên mỗi khung hình chỉ vẽ lại các vùng thay đổi.
+class OffscreenRenderer:
+    def __init__(self, level, vision, size, exit_pos=None, profiler=None):
+        self.size = size
+        self.exit_pos = exit_pos  # Lối ra không có trong ReplayState (replay lưu trong header)
+        self.surface = pygame.Surface(size, 0, 32, RGBX_MASKS)
+        self.view = GameView(level, vision, size, profiler=profiler)
+
+    # Vẽ trạng thái state (ReplayState), nội suy từ prev theo alpha; trả về surface khung hình
+    def render(self, state, prev=None, alpha=1.0):
+        prev = prev or state
+        self.view.draw(self.surface, state.thief_pos, state.thief_direction, state.guards, state.items,
+                       self.exit_pos, prev.thief_pos, prev.guards, alpha)
+        self.view.renderer.end_frame(present=False)
+        return self.surface
+
+    # Bộ đệm điểm ảnh thô của khung hình hiện tại (không sao chép)
+    def buffer(self):
+        return self.surface.get_buffer()
+
+
+# Ghi mỗi khung hình thành một file PNG trong thư mục directory
+class PngSequence:
+    def __init__(self, directory, pattern=PNG_PATTERN):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, pattern)
+        self.frames = 0
+        self.bytes = 0
+
+    def write(self, renderer):
+        path = self.path % self.frames
+        pygame.image.save(renderer.surface, path)
+        self.frames += 1
+        self.bytes += os.path.getsize(path)
+
+    def close(self):
+        pass
+
+
+# Ghi các khung hình nối tiếp nhau (RGBX, không nén) vào một file, thẳng từ bộ đệm của surface
+class RawStream:
+    def __init__(self, path):
+        self.file = open(path, "wb")
+        self.frames = 0
+        self.bytes = 0
+
+    def write(self, renderer):
+        self.bytes += self.file.write(renderer.buffer())
+        self.frames += 1
+
+    def close(self):
+        self.file.close()
+
+
+# Trạng thái ván chơi sau mỗi bước (kể cả bước 0) khi chạy lại một replay
+def replay_states(replay):
+    player = ReplayPlayer(replay)
+    yield player.state.copy()
+    while player.step() is not None:
+        yield player.state.copy()
+
+
+# Trạng thái ván chơi sau mỗi bước (kể cả bước 0) khi chạy mô phỏng sim đến hết ván
+def simulation_states(sim):
+    yield ReplayState.from_simulation(sim)
+    while not sim.game_over:
+        sim.step()
+        yield ReplayState.from_simulation(sim)
+
+
+# Các khung hình (trước, sau, alpha) từ dãy trạng thái: frames_per_tick khung hình nội suy cho mỗi bước
+def interpolate(states, frames_per_tick=1):
+    prev = None
+    for state in states:
+        if prev is None:
+            yield state, state, 1.0
+        else:
+            for k in range(1, frames_per_tick + 1):
+                yield prev, state, k / frames_per_tick
+        prev = state
+
+
+# Vẽ (và ghi qua writer nếu có) mọi khung hình; trả về số khung hình đã vẽ
+def render_frames(renderer, frames, writer=None, profiler=None):
+    profiler = profiler or Profiler()
+    count = 0
+    for prev, state, alpha in frames:
+        profiler.begin_frame()
+        with profiler.timer("render"):
+            renderer.render(state, prev, alpha)
+        if writer is not None:
+            with profiler.timer("export"):
+                writer.write(renderer)
+        profiler.end_frame()
+        count += 1
+    return count
+
+
+# Báo cáo tốc độ vẽ: số khung hình mỗi giây và thời gian trung bình của từng phần mỗi khung hình
+def print_report(frames, size, elapsed, profiler, writer=None):
+    fps = frames / elapsed if elapsed > 0 else float("inf")
+    print("%d frames at %dx%d in %.2fs (%.1f frames/s)" % (frames, size[0], size[1], elapsed, fps))
+    stats = profiler.summary()
+    for name, value in sorted(stats["timers"].items(), key=lambda item: -item[1]):
+        print("  %-14s %8.3f ms/frame" % (name, value * 1e3))
+    if writer is not None and writer.frames:
+        print("  %d bytes written (%.1f KiB/frame)" % (writer.bytes, writer.bytes / writer.frames / 1024))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Vẽ ván chơi ra ảnh không cần cửa sổ (PNG, bộ đệm thô) và đo tốc độ vẽ")
+    parser.add_argument("source", help="file replay (.rpl) hoặc bản đồ .tmx (chạy một ván mới theo --seed)")
+    parser.add_argument("--size", type=parse_size, default=parse_size(DEFAULT_SIZE), help="kích thước khung hình, ví dụ 640x360")
+    parser.add_argument("--format", choices=("png", "raw", "none"), default="none",
+                        help="png: mỗi khung hình một file trong --out; raw: RGBX nối tiếp vào file --out; none: chỉ đo tốc độ vẽ")
+    parser.add_argument("--out", default=None, help="thư mục (png) hoặc file (raw) đầu ra")
+    parser.add_argument("--frames-per-tick", type=int, default=1, help="số khung hình nội suy cho mỗi bước logic")
+    parser.add_argument("--every", type=int, default=1, help="chỉ giữ một trong mỗi N khung hình")
+    parser.add_argument("--limit", type=int, default=None, help="số khung hình tối đa")
+    parser.add_argument("--last", action="store_true", help="chỉ vẽ khung hình cuối (ảnh thu nhỏ của ván)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-ticks", type=int, default=MAX_TICKS)
+    parser.add_argument("--guards", type=int, default=None, help="số ông chủ (mặc định: theo bản đồ)")
+    parser.add_argument("--profile-out", default=None, help="xuất thời gian từng khung hình ra file .json hoặc .csv")
+    args = parser.parse_args(argv)
+    if args.format != "none" and not args.out:
+        parser.error("--out is required with --format %s" % args.format)
+
+    pygame.font.init()
+    if args.source.endswith(".tmx"):
+        level = load_level(args.source)
+        sim = Simulation(level, seed=args.seed, world=World(level), guards=args.guards, max_ticks=args.max_ticks)
+        vision, exit_pos, states = sim.vision, sim.exit_pos, simulation_states(sim)
+    else:
+        replay = Replay.load(args.source)
+        if map_hash(replay.map_path) != replay.map_hash:
+            print("Warning: %s has changed since the replay was recorded" % replay.map_path)
+        level = load_level(replay.map_path)
+        params = replay.params
+        vision = VisionSystem(level.wall_grid, params.get("thief_vision_range", THIEF_VISION_RANGE),
+                              params.get("master_vision_range", MASTER_VISION_RANGE))
+        exit_pos, states = replay.exit_pos, replay_states(replay)
+
+    profiler = Profiler(enabled=True, capacity=1 << 20)
+    start = time.perf_counter()
+    renderer = OffscreenRenderer(level, vision, args.size, exit_pos, profiler)
+    print("View built in %.1f ms" % ((time.perf_counter() - start) * 1e3))
+
+    frames = interpolate(states, max(args.frames_per_tick, 1))
+    frames = itertools.islice(frames, None, None, max(args.every, 1))
+    if args.last:
+        frames = deque(frames, maxlen=1)
+    elif args.limit is not None:
+        frames = itertools.islice(frames, args.limit)
+    writer = None
+    if args.format == "png":
+        writer = PngSequence(args.out)
+    elif args.format == "raw":
+        writer = RawStream(args.out)
+
+    start = time.perf_counter()
+    try:
+        count = render_frames(renderer, frames, writer, profiler)
+    finally:
+        if writer is not None:
+            writer.close()
+    print_report(count, args.size, time.perf_counter() - start, profiler, writer)
+    if args.format == "raw":
+        print("ffmpeg -f rawvideo -pix_fmt rgb0 -s %dx%d -i %s out.mp4" % (args.size[0], args.size[1], args.out))
+    if args.profile_out:
+        profiler.export(args.profile_out)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+import csv
+import json
+import time
+from collections import deque
+
+# Số khung hình gần nhất giữ trong bộ đệm vòng
+RING_SIZE = 600
+
+# Số khung hình lấy trung bình khi hiển thị overlay
+OVERLAY_FRAMES = 30
+
+
+# Context rỗng dùng khi tắt đo: không gọi đồng hồ, không cấp phát
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        timers = self.profiler.timers
+        timers[self.name] = timers.get(self.name, 0.0) + time.perf_counter() - self.start
+        return False
+
+
+# Đo thời gian theo tên (cộng dồn trong một khung hình, timer lồng nhau tính cả phần bên trong)
+# và bộ đếm (ví dụ số nút đã mở rộng); mỗi khung hình được lưu vào bộ đệm vòng kích thước
+# cố định. Khi tắt (mặc định) mọi lời gọi gần như không tốn gì và không in ra gì.
+class Profiler:
+    def __init__(self, enabled=False, capacity=RING_SIZE):
+        self.enabled = enabled
+        self.frames = deque(maxlen=capacity)
+        self.frame = 0
+        self.timers = {}
+        self.counters = {}
+        self._frame_start = None
+
+    def timer(self, name):
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name)
+
+    def count(self, name, value=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def begin_frame(self):
+        if self.enabled:
+            self.timers = {}
+            self.counters = {}
+            self._frame_start = time.perf_counter()
+
+    def end_frame(self):
+        if not self.enabled or self._frame_start is None:
+            return
+        self.frames.append({
+            "frame": self.frame,
+            "frame_time": time.perf_counter() - self._frame_start,
+            "timers": self.timers,
+            "counters": self.counters,
+        })
+        self.frame += 1
+        self._frame_start = None
+
+    # Tên mọi timer/bộ đếm xuất hiện trong bộ đệm (theo thứ tự xuất hiện)
+    def names(self):
+        timers, counters = {}, {}
+        for record in self.frames:
+            timers.update(dict.fromkeys(record["timers"]))
+            counters.update(dict.fromkeys(record["counters"]))
+        return list(timers), list(counters)
+
+    # Trung bình (giây / giá trị đếm) mỗi khung hình trên last khung hình gần nhất
+    def summary(self, last=None):
+        frames = list(self.frames)[-last:] if last else list(self.frames)
+        if not frames:
+            return {"frames": 0, "frame_time": 0.0, "timers": {}, "counters": {}}
+        n = len(frames)
+        timers, counters = {}, {}
+        for record in frames:
+            for name, value in record["timers"].items():
+                timers[name] = timers.get(name, 0.0) + value
+            for name, value in record["counters"].items():
+                counters[name] = counters.get(name, 0) + value
+        return {
+            "frames": n,
+            "frame_time": sum(record["frame_time"] for record in frames) / n,
+            "timers": {name: value / n for name, value in timers.items()},
+            "counters": {name: value / n for name, value in counters.items()},
+        }
+
+    # Các dòng chữ cho overlay: thời gian khung hình và phần của từng timer
+    def overlay_lines(self, last=OVERLAY_FRAMES):
+        stats = self.summary(last)
+        lines = ["frame %.2f ms" % (stats["frame_time"] * 1e3)]
+        for name, value in sorted(stats["timers"].items(), key=lambda item: -item[1]):
+            lines.append("%s %.2f ms" % (name, value * 1e3))
+        for name, value in stats["counters"].items():
+            lines.append("%s %.1f" % (name, value))
+        return lines
+
+    # Xuất bộ đệm ra file .json (kèm tóm tắt) hoặc .csv (mỗi khung hình một dòng, thời gian theo ms)
+    def export(self, path):
+        if path.endswith(".csv"):
+            timer_names, counter_names = self.names()
+            with open(path, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["frame", "frame_ms"] + ["%s_ms" % name for name in timer_names] + counter_names)
+                for record in self.frames:
+                    writer.writerow([record["frame"], "%.4f" % (record["frame_time"] * 1e3)] +
+                                    ["%.4f" % (record["timers"].get(name, 0.0) * 1e3) for name in timer_names] +
+                                    [record["counters"].get(name, 0) for name in counter_names])
+        else:
+            with open(path, "w") as f:
+                json.dump({"summary": self.summary(), "frames": list(self.frames)}, f, indent=2)
@@ -0,0 +1,292 @@
+import base64
+import gzip
+import hashlib
+import marshal
+import os
+import struct
+import xml.etree.ElementTree as ET
+import zlib
+
+# Cờ lật/xoay trong GID gốc của Tiled
+FLIP_HORIZONTAL = 1 << 31  # Bit 31: Lật ngang
+FLIP_VERTICAL = 1 << 30    # Bit 30: Lật dọc
+FLIP_DIAGONAL = 1 << 29    # Bit 29: Xoay 90 độ (kết hợp lật)
+GID_MASK = ~(FLIP_HORIZONTAL | FLIP_VERTICAL | FLIP_DIAGONAL) & 0xFFFFFFFF
+
+# Định dạng file level đã biên dịch:
+# magic, phiên bản, mtime (ns) và kích thước của file TMX, SHA-1 của TMX + tileset
+CACHE_DIR_NAME = ".levelcache"
+CACHE_MAGIC = b"LVLC"
+CACHE_VERSION = 2
+CACHE_HEADER = struct.Struct("<4sHqq20s")
+
+
+# Tách GID gốc thành (GID thật, lật ngang, lật dọc, lật chéo)
+def decode_gid(raw_gid):
+    return (raw_gid & GID_MASK,
+            bool(raw_gid & FLIP_HORIZONTAL),
+            bool(raw_gid & FLIP_VERTICAL),
+            bool(raw_gid & FLIP_DIAGONAL))
+
+
+# Đồ nội thất (tile object) trong layer "FurnitureObjects", toạ độ theo pixel bản đồ gốc
+class FurnitureObject:
+    __slots__ = ("id", "gid", "x", "y", "width", "height", "rotation")
+
+    def __init__(self, id, gid, x, y, width, height, rotation=0.0):
+        self.id = id
+        self.gid = gid  # GID gốc, còn giữ cờ lật
+        self.x = x
+        self.y = y  # Đã đổi về góc trên-trái (Tiled lưu góc dưới-trái)
+        self.width = width
+        self.height = height
+        self.rotation = rotation
+
+    @property
+    def rect(self):
+        return (self.x, self.y, self.width, self.height)
+
+
+# Một màn chơi đã được phân tích từ file TMX: lưới tường, đồ nội thất,
+# GID gốc kèm cờ lật, vị trí xuất phát, vật phẩm và lối ra
+class Level:
+    def __init__(self, path, rows, cols, tile_width, tile_height, tile_layers,
+                 wall_grid, furniture, thief_pos, master_positions, items, exit_pos, tiles):
+        self.path = path
+        self.rows = rows
+        self.cols = cols
+        self.tile_width = tile_width
+        self.tile_height = tile_height
+        self.tile_layers = tile_layers  # [(tên, hiển thị, [[GID gốc]])]
+        self.wall_grid = wall_grid  # 1 = tường, 0 = trống
+        self.furniture = furniture  # [FurnitureObject]
+        self.thief_pos = thief_pos  # [hàng, cột] hoặc None
+        self.master_positions = master_positions  # [[hàng, cột], ...]
+        self.items = items
+        self.exit_pos = exit_pos
+        self.tiles = tiles  # GID thật -> (đường dẫn ảnh, rộng, cao), chỉ những GID được dùng
+
+    @property
+    def master_pos(self):
+        return self.master_positions[0] if self.master_positions else None
+
+    # Danh sách hình chữ nhật (x, y, rộng, cao) của đồ nội thất theo pixel bản đồ gốc
+    def furniture_rects(self):
+        return [obj.rect for obj in self.furniture]
+
+    def to_payload(self):
+        return (self.rows, self.cols, self.tile_width, self.tile_height,
+                self.tile_layers, self.wall_grid,
+                [(o.id, o.gid, o.x, o.y, o.width, o.height, o.rotation) for o in self.furniture],
+                self.thief_pos, self.master_positions, self.items, self.exit_pos, self.tiles)
+
+    @classmethod
+    def from_payload(cls, path, payload):
+        (rows, cols, tile_width, tile_height, tile_layers, wall_grid, furniture,
+         thief_pos, master_positions, items, exit_pos, tiles) = payload
+        return cls(path, rows, cols, tile_width, tile_height, tile_layers, wall_grid,
+                   [FurnitureObject(*f) for f in furniture],
+                   thief_pos, master_positions, items, exit_pos, tiles)
+
+
+# Đọc dữ liệu một layer tile (csv hoặc base64, có thể nén zlib/gzip)
+def _parse_layer_data(data_node, width, height):
+    encoding = data_node.get("encoding")
+    if encoding == "csv":
+        gids = [int(v) for v in data_node.text.replace("\n", "").replace("\r", "").split(",") if v.strip()]
+    elif encoding == "base64":
+        raw = base64.b64decode(data_node.text.strip())
+        compression = data_node.get("compression")
+        if compression == "zlib":
+            raw = zlib.decompress(raw)
+        elif compression == "gzip":
+            raw = gzip.decompress(raw)
+        gids = list(struct.unpack("<%dI" % (len(raw) // 4), raw))
+    else:
+        gids = [int(tile.get("gid", 0)) for tile in data_node.findall("tile")]
+    return [gids[y * width:(y + 1) * width] for y in range(height)]
+
+
+# Đọc các tileset (nhúng hoặc file .tsx ngoài): GID thật -> (đường dẫn ảnh, rộng, cao)
+def _parse_tilesets(root, tmx_dir, used_gids):
+    tiles = {}
+    sources = []
+    for tileset in root.findall("tileset"):
+        firstgid = int(tileset.get("firstgid"))
+        node = tileset
+        base_dir = tmx_dir
+        if tileset.get("source"):
+            tsx_path = os.path.normpath(os.path.join(tmx_dir, tileset.get("source")))
+            sources.append(tsx_path)
+            node = ET.parse(tsx_path).getroot()
+            base_dir = os.path.dirname(tsx_path)
+        for tile in node.findall("tile"):
+            gid = firstgid + int(tile.get("id"))
+            image = tile.find("image")
+            if gid not in used_gids or image is None:
+                continue
+            tiles[gid] = (os.path.normpath(os.path.join(base_dir, image.get("source"))),
+                          int(image.get("width", 0)), int(image.get("height", 0)))
+    return tiles, sources
+
+
+# Phân tích file TMX thành Level (không cần pygame/pytmx)
+def parse_tmx(path):
+    root = ET.parse(path).getroot()
+    rows = int(root.get("height"))
+    cols = int(root.get("width"))
+    tile_width = int(root.get("tilewidth"))
+    tile_height = int(root.get("tileheight"))
+
+    tile_layers = []
+    wall_grid = [[0 for _ in range(cols)] for _ in range(rows)]
+    used_gids = set()
+    for layer in root.iter("layer"):
+        data = _parse_layer_data(layer.find("data"), int(layer.get("width")), int(layer.get("height")))
+        visible = layer.get("visible", "1") != "0"
+        tile_layers.append((layer.get("name"), visible, data))
+        for row in data:
+            for gid in row:
+                if gid:
+                    used_gids.add(gid & GID_MASK)
+        # Đánh dấu các ô tường từ layer "Wall"
+        if layer.get("name") == "Wall":
+            for y in range(rows):
+                for x in range(cols):
+                    if data[y][x] != 0:
+                        wall_grid[y][x] = 1
+
+    furniture = []
+    thief_pos = None
+    master_positions = []
+    items = []
+    exit_pos = None
+    for group in root.iter("objectgroup"):
+        name = group.get("name")
+        for obj in group.findall("object"):
+            x = float(obj.get("x", 0))
+            y = float(obj.get("y", 0))
+            if name == "FurnitureObjects":
+                gid = int(obj.get("gid", 0))
+                if gid == 0:
+                    continue
+                used_gids.add(gid & GID_MASK)
+                width = float(obj.get("width", tile_width))
+                height = float(obj.get("height", tile_height))
+                # Tile object của Tiled có gốc toạ độ ở góc dưới-trái
+                furniture.append(FurnitureObject(int(obj.get("id")), gid, x, y - height,
+                                                 width, height, float(obj.get("rotation", 0))))
+            elif name == "Objects":
+                cell = [int(y // tile_height), int(x // tile_width)]
+                obj_name = obj.get("name")
+                if obj_name == "thief":
+                    thief_pos = cell
+                elif obj_name == "master":
+                    master_positions.append(cell)
+                elif obj_name == "item":
+                    items.append(cell)
+                elif obj_name == "exit":
+                    exit_pos = cell
+
+    tiles, tileset_sources = _parse_tilesets(root, os.path.dirname(path), used_gids)
+    level = Level(path, rows, cols, tile_width, tile_height, tile_layers, wall_grid,
+                  furniture, thief_pos, master_positions, items, exit_pos, tiles)
+    return level, tileset_sources
+
+
+def _cache_path(path):
+    directory, name = os.path.split(os.path.abspath(path))
+    return os.path.join(directory, CACHE_DIR_NAME, os.path.splitext(name)[0] + ".lvl")
+
+
+# Băm nội dung TMX và các tileset nó tham chiếu
+def _source_hash(path, tileset_sources):
+    digest = hashlib.sha1()
+    for source in [path] + list(tileset_sources):
+        with open(source, "rb") as f:
+            digest.update(f.read())
+    return digest.digest()
+
+
+# Như _source_hash nhưng None nếu một file không còn đọc được (cache coi như cũ, phân tích lại)
+def _cached_hash(path, tileset_sources):
+    try:
+        return _source_hash(path, tileset_sources)
+    except OSError:
+        return None
+
+
+# Các tileset không được sửa sau khi ghi cache
+def _tilesets_older_than(tileset_sources, cache_path):
+    try:
+        cache_mtime = os.stat(cache_path).st_mtime_ns
+        return all(os.stat(source).st_mtime_ns <= cache_mtime for source in tileset_sources)
+    except OSError:
+        return False
+
+
+def _read_cache(cache_path):
+    try:
+        with open(cache_path, "rb") as f:
+            blob = f.read()
+        magic, version, mtime_ns, size, digest = CACHE_HEADER.unpack_from(blob)
+        if magic != CACHE_MAGIC or version != CACHE_VERSION:
+            return None
+        return mtime_ns, size, digest, blob[CACHE_HEADER.size:]
+    except (OSError, struct.error):
+        return None
+
+
+# Đổi đường dẫn tileset và ảnh tile trong payload bằng convert (ghi cache: tương đối so với thư
+# mục chứa TMX; đọc cache: ghép lại với thư mục đó) để cache dùng được từ thư mục làm việc bất kỳ
+def _map_paths(payload, tileset_sources, convert):
+    tiles = {gid: (convert(image), width, height) for gid, (image, width, height) in payload[-1].items()}
+    return payload[:-1] + (tiles,), [convert(source) for source in tileset_sources]
+
+
+def _write_cache(cache_path, stat, digest, level, tileset_sources):
+    tmx_dir = os.path.dirname(os.path.abspath(level.path))
+    payload = marshal.dumps(_map_paths(level.to_payload(), tileset_sources,
+                                       lambda p: os.path.relpath(os.path.abspath(p), tmx_dir)))
+    blob = CACHE_HEADER.pack(CACHE_MAGIC, CACHE_VERSION, stat.st_mtime_ns, stat.st_size, digest)
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = cache_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(blob + zlib.compress(payload))
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass  # Không ghi được cache thì lần sau phân tích lại
+
+
+# Tải level: dùng bản biên dịch trong cache nếu file TMX chưa thay đổi
+# (so mtime/kích thước trước, sau đó mới so hash), ngược lại phân tích lại và ghi cache
+def load_level(path, use_cache=True):
+    if not use_cache:
+        return parse_tmx(path)[0]
+
+    cache_path = _cache_path(path)
+    stat = os.stat(path)
+    cached = _read_cache(cache_path)
+    if cached is not None:
+        mtime_ns, size, digest, body = cached
+        try:
+            payload, tileset_sources = marshal.loads(zlib.decompress(body))
+            tmx_dir = os.path.dirname(path)
+            payload, tileset_sources = _map_paths(payload, tileset_sources,
+                                                  lambda p: os.path.normpath(os.path.join(tmx_dir, p)))
+        except (ValueError, EOFError, TypeError, zlib.error):
+            payload = None
+        if payload is not None:
+            fresh = (mtime_ns == stat.st_mtime_ns and size == stat.st_size and
+                     _tilesets_older_than(tileset_sources, cache_path))
+            if not fresh and _cached_hash(path, tileset_sources) == digest:
+                # Nội dung không đổi (chỉ mtime thay đổi): làm mới header
+                _write_cache(cache_path, stat, digest, Level.from_payload(path, payload), tileset_sources)
+                fresh = True
+            if fresh:
+                return Level.from_payload(path, payload)
+
+    level, tileset_sources = parse_tmx(path)
+    _write_cache(cache_path, stat, _source_hash(path, tileset_sources), level, tileset_sources)
+    return level
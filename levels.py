@@ -0,0 +1,105 @@
+import glob
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+MAP_DIR = "map"
+
+# Số màn đã chuẩn bị giữ lại trong cache (kể cả màn đang chơi và màn tiếp theo)
+LEVEL_CACHE_SIZE = 3
+
+
+# Đường dẫn TMX từ danh sách tên bản đồ ("5", "map/5.tmx") hoặc thư mục
+def resolve_maps(names):
+    if not names:
+        return sorted(glob.glob(os.path.join(MAP_DIR, "*.tmx")))
+    paths = []
+    for name in names:
+        if os.path.isdir(name):
+            paths.extend(sorted(glob.glob(os.path.join(name, "*.tmx"))))
+        elif os.path.exists(name):
+            paths.append(name)
+        else:
+            paths.append(os.path.join(MAP_DIR, f"{name}.tmx"))
+    return paths
+
+
+# Chiến dịch: các màn chơi lần lượt theo paths. Trong lúc chơi một màn, màn tiếp theo được
+# chuẩn bị bằng prepare(path) (phân tích TMX, dựng dữ liệu tĩnh, vẽ sẵn nền) trong một luồng
+# nền, nên chuyển màn chỉ là đổi tham chiếu. Các màn vừa chơi được giữ trong cache LRU.
+class LevelManager:
+    def __init__(self, paths, prepare, cache_size=LEVEL_CACHE_SIZE, loop=False):
+        self.paths = list(paths)
+        self.prepare = prepare
+        self.cache_size = max(cache_size, 2)  # Luôn đủ chỗ cho màn hiện tại và màn tiếp theo
+        self.loop = loop  # Hết chiến dịch thì quay lại màn đầu
+        self.cache = OrderedDict()  # đường dẫn -> màn đã chuẩn bị
+        self.pending = {}  # đường dẫn -> Future của màn đang chuẩn bị ở luồng nền
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="level-preload")
+        self.index = -1
+        self.current = None
+        self.hits = 0  # Số lần chuyển màn có sẵn trong cache hoặc đã chuẩn bị xong
+        self.stalls = 0  # Số lần phải chờ/chuẩn bị ngay khi chuyển màn
+        self.last_switch_time = 0.0  # Thời gian (giây) của lần chuyển màn gần nhất
+
+    @property
+    def current_path(self):
+        return self.paths[self.index] if 0 <= self.index < len(self.paths) else None
+
+    def _next_index(self):
+        index = self.index + 1
+        if index >= len(self.paths):
+            return 0 if self.loop and self.paths else None
+        return index
+
+    # Bắt đầu chuẩn bị màn path ở luồng nền (nếu chưa có trong cache hoặc đang chuẩn bị)
+    def preload(self, path):
+        if path is not None and path not in self.cache and path not in self.pending:
+            self.pending[path] = self.executor.submit(self.prepare, path)
+
+    # Màn path đã sẵn sàng để chuyển ngay chưa
+    def ready(self, path):
+        future = self.pending.get(path)
+        return path in self.cache or (future is not None and future.done())
+
+    # Màn đã chuẩn bị cho path: lấy từ cache, chờ luồng nền nếu đang chuẩn bị, hoặc chuẩn bị ngay
+    def get(self, path):
+        prepared = self.cache.get(path)
+        if prepared is not None:
+            self.cache.move_to_end(path)
+            self.hits += 1
+            return prepared
+        future = self.pending.pop(path, None)
+        if future is not None and future.done():
+            self.hits += 1
+        else:
+            self.stalls += 1
+        prepared = future.result() if future is not None else self.prepare(path)
+        self._store(path, prepared)
+        return prepared
+
+    def _store(self, path, prepared):
+        self.cache[path] = prepared
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    # Chuyển sang màn tiếp theo và bắt đầu chuẩn bị màn sau nó; trả về None khi hết chiến dịch
+    def advance(self):
+        index = self._next_index()
+        if index is None:
+            self.current = None
+            return None
+        start = time.perf_counter()
+        self.index = index
+        self.current = self.get(self.paths[index])
+        self.last_switch_time = time.perf_counter() - start
+        following = self._next_index()
+        if following is not None:
+            self.preload(self.paths[following])
+        return self.current
+
+    # Huỷ các màn đang chờ chuẩn bị và dừng luồng nền
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.pending.clear()
@@ -0,0 +1,229 @@
+import heapq
+from array import array
+
+from walkability import DIRECTIONS
+
+INF = 1 << 30
+
+
+# Danh sách ô kề (id phẳng) đi được của mỗi ô, tính một lần cho một WalkGrid
+def build_neighbors(walk_grid):
+    rows, cols = walk_grid.rows, walk_grid.cols
+    blocked = walk_grid.blocked
+    neighbors = []
+    for i in range(rows * cols):
+        r, c = divmod(i, cols)
+        cell = []
+        for dr, dc in DIRECTIONS:
+            nr, nc = r + dr, c + dc
+            if 0 <= nr < rows and 0 <= nc < cols and not blocked[nr * cols + nc]:
+                cell.append(nr * cols + nc)
+        neighbors.append(tuple(cell))
+    return neighbors
+
+
+# D* Lite (Koenig & Likhachev): tìm ngược từ đích, khi điểm xuất phát di chuyển, có chướng
+# ngại di động thay đổi hoặc chi phí vài ô thay đổi thì chỉ sửa lại phần đường bị ảnh hưởng.
+# Chi phí của bước u -> v là cost[v] (mặc định 1; bảng có thể dùng chung, ví dụ với DangerMap)
+class DStarLite:
+    def __init__(self, walk_grid, goal, neighbors=None, cost=None):
+        self.walk_grid = walk_grid
+        self.rows, self.cols = walk_grid.rows, walk_grid.cols
+        n = self.rows * self.cols
+        self.neighbors = neighbors if neighbors is not None else build_neighbors(walk_grid)
+        self.cost = cost if cost is not None else array('i', [1]) * n
+        self.goal = list(goal)
+        self.goal_id = goal[0] * self.cols + goal[1]
+        self.g = array('i', [INF]) * n
+        self.rhs = array('i', [INF]) * n
+        self.open_key = {}  # id -> khoá hiện tại trong heap (xoá lười)
+        self.heap = []
+        self.obstacles = set()  # Ô bị chướng ngại di động chặn tạm thời
+        self.km = 0
+        self.start_id = None
+        self.last_start_id = None
+        self.nodes_expanded = 0
+
+        self.rhs[self.goal_id] = 0
+        self._push(self.goal_id)
+
+    def _h(self, a, b):
+        ar, ac = divmod(a, self.cols)
+        br, bc = divmod(b, self.cols)
+        return abs(ar - br) + abs(ac - bc)
+
+    def _key(self, i):
+        m = min(self.g[i], self.rhs[i])
+        return (m + self._h(self.start_id, i) + self.km, m)
+
+    def _push(self, i):
+        if self.start_id is None:
+            key = (min(self.g[i], self.rhs[i]), min(self.g[i], self.rhs[i]))
+        else:
+            key = self._key(i)
+        self.open_key[i] = key
+        heapq.heappush(self.heap, (key, i))
+
+    def _top(self):
+        heap = self.heap
+        while heap:
+            key, i = heap[0]
+            if self.open_key.get(i) == key:
+                return key, i
+            heapq.heappop(heap)
+        return (INF, INF), None
+
+    def _update_vertex(self, i):
+        if i != self.goal_id:
+            best = INF
+            if i not in self.obstacles:
+                g, cost = self.g, self.cost
+                for j in self.neighbors[i]:
+                    if j not in self.obstacles and g[j] < INF and g[j] + cost[j] < best:
+                        best = g[j] + cost[j]
+            self.rhs[i] = best
+        self.open_key.pop(i, None)
+        if self.g[i] != self.rhs[i]:
+            self._push(i)
+
+    def _compute_shortest_path(self):
+        start = self.start_id
+        g, rhs, neighbors = self.g, self.rhs, self.neighbors
+        expanded = 0
+        while True:
+            top_key, u = self._top()
+            if u is None or (top_key >= self._key(start) and rhs[start] == g[start]):
+                break
+            new_key = self._key(u)
+            if top_key < new_key:
+                self._push(u)
+                continue
+            heapq.heappop(self.heap)
+            del self.open_key[u]
+            expanded += 1
+            if g[u] > rhs[u]:
+                g[u] = rhs[u]
+                for j in neighbors[u]:
+                    self._update_vertex(j)
+            else:
+                g[u] = INF
+                self._update_vertex(u)
+                for j in neighbors[u]:
+                    self._update_vertex(j)
+        self.nodes_expanded = expanded
+
+    # Cập nhật vị trí xuất phát (nhân vật vừa di chuyển)
+    def update_start(self, start):
+        start_id = start[0] * self.cols + start[1]
+        if self.start_id is None:
+            self.start_id = self.last_start_id = start_id
+            # Khoá đã đẩy trước khi biết điểm xuất phát phải tính lại
+            for i in list(self.open_key):
+                self._push(i)
+            return
+        if start_id != self.start_id:
+            self.km += self._h(self.last_start_id, start_id)
+            self.last_start_id = start_id
+            self.start_id = start_id
+
+    # Đặt tập ô bị chướng ngại di động chặn (ví dụ vị trí nhân vật khác)
+    def set_obstacles(self, cells):
+        new = {r * self.cols + c for r, c in cells} - {self.goal_id}
+        changed = new ^ self.obstacles
+        if not changed:
+            return
+        if self.start_id is not None:
+            self.km += self._h(self.last_start_id, self.start_id)
+            self.last_start_id = self.start_id
+        self.obstacles = new
+        for i in changed:
+            self._update_vertex(i)
+            for j in self.neighbors[i]:
+                self._update_vertex(j)
+
+    # Các ô (id) có chi phí vừa đổi trong bảng cost: cập nhật mọi cạnh đi vào chúng
+    def update_costs(self, cells):
+        if not cells:
+            return
+        if self.start_id is not None:
+            self.km += self._h(self.last_start_id, self.start_id)
+            self.last_start_id = self.start_id
+        for i in cells:
+            for j in self.neighbors[i]:
+                self._update_vertex(j)
+
+    # Ô kề tốt nhất (id) từ ô i theo g hiện tại, None nếu không có
+    def _best_neighbor(self, i):
+        best, best_g = None, INF
+        g, cost = self.g, self.cost
+        for j in self.neighbors[i]:
+            if j not in self.obstacles and g[j] < INF and g[j] + cost[j] < best_g:
+                best, best_g = j, g[j] + cost[j]
+        return best
+
+    # Ô tiếp theo [hàng, cột] từ điểm xuất phát, None nếu đã tới đích hoặc không tới được
+    def next_step(self):
+        self._compute_shortest_path()
+        start = self.start_id
+        if start == self.goal_id or self.g[start] >= INF:
+            return None
+        best = self._best_neighbor(start)
+        return list(divmod(best, self.cols)) if best is not None else None
+
+    # Đường đi hiện tại từ điểm xuất phát tới đích, chỉ sửa lại phần bị ảnh hưởng
+    def path(self):
+        self._compute_shortest_path()
+        start = self.start_id
+        if self.g[start] >= INF and start != self.goal_id:
+            return None
+        cols = self.cols
+        path = [list(divmod(start, cols))]
+        i = start
+        limit = len(self.g)
+        while i != self.goal_id and limit > 0:
+            best = self._best_neighbor(i)
+            if best is None:
+                return None
+            i = best
+            path.append(list(divmod(i, cols)))
+            limit -= 1
+        return path
+
+
+# Bộ lập kế hoạch tăng dần cho một nhân vật: giữ D* Lite khi đích không đổi,
+# chỉ dựng lại khi đích thay đổi; cost: chi phí đi vào mỗi ô (None = 1)
+class IncrementalPlanner:
+    def __init__(self, walk_grid, neighbors=None, cost=None):
+        self.walk_grid = walk_grid
+        self.neighbors = neighbors if neighbors is not None else build_neighbors(walk_grid)
+        self.cost = cost
+        self.search = None
+
+    @property
+    def nodes_expanded(self):
+        return self.search.nodes_expanded if self.search else 0
+
+    def _prepare(self, start, goal):
+        if not self.walk_grid.is_free(goal[0], goal[1]):
+            return None
+        if self.search is None or self.search.goal != list(goal):
+            self.search = DStarLite(self.walk_grid, goal, self.neighbors, self.cost)
+        self.search.update_start(start)
+        return self.search
+
+    # Các ô (id) có chi phí vừa đổi trong bảng cost
+    def update_costs(self, cells):
+        if self.search is not None:
+            self.search.update_costs(cells)
+
+    def plan(self, start, goal, obstacles=()):
+        search = self._prepare(start, goal)
+        if search is None:
+            return None
+        search.set_obstacles(obstacles)
+        return search.path()
+
+    # Chỉ ô tiếp theo trên đường đi (không dựng cả đường đi), None nếu đã tới hoặc không tới được
+    def next_step(self, start, goal):
+        search = self._prepare(start, goal)
+        return search.next_step() if search is not None else None
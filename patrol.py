@@ -0,0 +1,119 @@
+import math
+import random
+
+import numpy as np
+
+from flowfield import UNREACHABLE, FlowField, distance_field, free_mask
+from route import EXACT_LIMIT, NO_PATH, solve_exact, solve_heuristic
+
+# Số điểm tuần tra tối đa của một màn (mỗi điểm giữ một trường khoảng cách)
+PATROL_POINTS = 24
+
+# Cạnh nhỏ nhất (số ô) của một khối khi chia bản đồ để chọn điểm tuần tra
+PATROL_BLOCK_MIN = 4
+
+# Khi vào vòng tuần tra, mỗi bước chưa có ông chủ ghé một điểm bù lại một bước đường đi
+# (tối đa PATROL_STALE_TICKS) để các ông chủ tản ra các khu vực lâu chưa được tuần tra
+PATROL_STALE_TICKS = 64
+
+# Khi vào vòng tuần tra với bộ sinh số ngẫu nhiên của ván, chọn ngẫu nhiên trong các điểm có
+# điểm số kém điểm tốt nhất không quá chừng này bước (mỗi ván tuần tra theo một cách khác nhau)
+PATROL_ENTRY_SLACK = 8
+
+
+# Vòng tuần tra dựng sẵn cho một màn (dữ liệu tĩnh, dùng chung mọi ván): chỉ các ô trống tới
+# được từ vị trí xuất phát của ông chủ; điểm tuần tra chọn thô-tới-tinh (chia khối, chọn khối theo
+# số ô tới được trong khối, trong khối chọn ô gần trọng tâm nhất); thứ tự ghé các điểm là lời giải
+# TSP khép kín; trường khoảng cách tới mỗi điểm tính một lần nên mọi đoạn đường giữa hai điểm
+# liên tiếp đã có sẵn, lúc chơi không phải tìm đường.
+class PatrolRoutes:
+    def __init__(self, walk_grid, spawns=(), max_points=PATROL_POINTS, seed=0):
+        free = free_mask(walk_grid)
+        self.reachable = self._reachable(free, walk_grid, spawns)
+        self.cells = [[int(r), int(c)] for r, c in zip(*np.nonzero(self.reachable))]
+        self.points = self._sample_points(max_points, random.Random(seed))
+        self.fields = [FlowField(free, point) for point in self.points]
+        self.circuits = {}  # tập chỉ số điểm tới được -> vòng tuần tra (danh sách chỉ số điểm)
+
+    # Các ô trống tới được từ vị trí xuất phát của ông chủ (không có thì mọi ô trống)
+    @staticmethod
+    def _reachable(free, walk_grid, spawns):
+        reachable = np.zeros_like(free)
+        for spawn in spawns:
+            start = walk_grid.nearest_free(spawn)
+            if start is not None and not reachable[start[0], start[1]]:
+                reachable |= distance_field(free, start) != UNREACHABLE
+        return reachable if reachable.any() else free.copy()
+
+    def _sample_points(self, max_points, rng):
+        if not self.cells:
+            return []
+        rows, cols = self.reachable.shape
+        block = max(PATROL_BLOCK_MIN, math.ceil(math.sqrt(len(self.cells) / max_points)))
+        blocks = {}
+        for r, c in self.cells:
+            blocks.setdefault((r // block, c // block), []).append((r, c))
+        keys = sorted(blocks)
+        if len(keys) > max_points:
+            # Chọn khối không lặp, xác suất theo số ô tới được trong khối (khối gần như trống ít được chọn)
+            weights = [len(blocks[key]) for key in keys]
+            chosen = []
+            for _ in range(max_points):
+                k = rng.choices(range(len(keys)), weights)[0]
+                chosen.append(keys[k])
+                weights[k] = 0
+            keys = sorted(chosen)
+        points = []
+        for key in keys:
+            cells = blocks[key]
+            mr = sum(r for r, _ in cells) / len(cells)
+            mc = sum(c for _, c in cells) / len(cells)
+            r, c = min(cells, key=lambda cell: ((cell[0] - mr) ** 2 + (cell[1] - mc) ** 2, cell))
+            points.append([r, c])
+        return points
+
+    # Khoảng cách từ pos tới điểm tuần tra i, None nếu không tới được
+    def distance(self, i, pos):
+        return self.fields[i].distance(pos)
+
+    # Vòng tuần tra qua các điểm indices: TSP khép kín bắt đầu và kết thúc ở điểm đầu tiên
+    def circuit(self, indices):
+        indices = tuple(indices)
+        circuit = self.circuits.get(indices)
+        if circuit is None:
+            head, rest = indices[0], indices[1:]
+
+            def cost(a, b):
+                d = self.fields[b].distance(self.points[a])
+                return NO_PATH if d is None else d
+            start_cost = [cost(head, i) for i in rest]
+            dist = [[cost(i, j) for j in rest] for i in rest]
+            exit_cost = [cost(i, head) for i in rest]
+            solve = solve_exact if len(rest) <= EXACT_LIMIT else solve_heuristic
+            circuit = [head] + [rest[k] for k in solve(start_cost, dist, exit_cost)]
+            self.circuits[indices] = circuit
+        return circuit
+
+    # Vào vòng tuần tra từ pos: chọn điểm gần nhất có tính độ lâu chưa được ghé (visits: bước
+    # cuối cùng mỗi điểm được ghé) và chiều đi về phía điểm lâu chưa ghé hơn. Có rng (bộ sinh số
+    # của ván) thì chọn ngẫu nhiên trong các điểm gần tốt nhất và chiều khi hai phía ngang nhau.
+    # Trả về (vòng tuần tra, vị trí trong vòng, chiều +1/-1), None nếu không tới được điểm nào.
+    def enter(self, pos, visits, tick, rng=None):
+        scores = [(d - min(tick - visits[i], PATROL_STALE_TICKS), i)
+                  for i, d in ((i, self.distance(i, pos)) for i in range(len(self.points))) if d is not None]
+        if not scores:
+            return None
+        circuit = self.circuit(i for _, i in scores)
+        best = min(scores)
+        if rng is None:
+            entry = best[1]
+        else:
+            entry = rng.choice([i for score, i in scores if score <= best[0] + PATROL_ENTRY_SLACK])
+        index = circuit.index(entry)
+        n = len(circuit)
+        ahead, behind = visits[circuit[(index + 1) % n]], visits[circuit[(index - 1) % n]]
+        if ahead == behind and rng is not None:
+            step = rng.choice((1, -1))
+        else:
+            step = 1 if ahead <= behind else -1
+        return circuit, index, step
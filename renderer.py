@@ -0,0 +1,127 @@
+import pygame
+
+from assets import AssetManager
+from level import decode_gid
+
+
+# Bộ vẽ bản đồ: ghép các layer tĩnh và đồ nội thất một lần duy nhất vào một
+# surface nền đã phóng to, mỗi khung hình chỉ vẽ lại các vùng thay đổi (dirty rect)
+class MapRenderer:
+    def __init__(self, level, screen_size, scale_factor, offset, background_color, assets=None):
+        self.level = level
+        self.screen_size = screen_size
+        self.scale_factor = scale_factor
+        self.grid_size = level.tile_width
+        self.scaled_grid_size = self.grid_size * scale_factor
+        self.offset_x, self.offset_y = offset
+        self.background_color = background_color
+
+        # Ảnh tile/đồ nội thất lấy từ atlas của bản đồ, biến thể đã phóng to/lật/xoay được cache
+        self.assets = assets or AssetManager(level)
+        self.background = self.build_background()
+
+        # Các vùng đã vẽ ở khung hình trước và khung hình hiện tại
+        self._prev_rects = []
+        self._rects = []
+        self._full_redraw = True
+
+    # Ghép toàn bộ phần tĩnh của bản đồ (nền, layer tile, đồ nội thất) vào một surface
+    # (đổi sang định dạng của cửa sổ nếu có; vẽ ngoài màn hình thì giữ định dạng mặc định)
+    def build_background(self):
+        background = pygame.Surface(self.screen_size)
+        if pygame.display.get_surface():
+            background = background.convert()
+        background.fill(self.background_color)
+        self._draw_tile_layers(background)
+        self._draw_furniture(background)
+        return background
+
+    def _draw_tile_layers(self, surface):
+        cell = int(self.scaled_grid_size)
+        # Mỗi ảnh tile chỉ phóng to một lần (cache biến thể), dùng lại cho mọi ô có cùng GID gốc
+        for name, visible, data in self.level.tile_layers:
+            if not visible:
+                continue
+            for y, row in enumerate(data):
+                for x, raw_gid in enumerate(row):
+                    if raw_gid == 0 or not self.assets.has_tile(decode_gid(raw_gid)[0]):
+                        continue
+                    scaled_image = self.assets.tile(raw_gid, (cell, cell))
+                    draw_x = x * self.scaled_grid_size + self.offset_x
+                    draw_y = y * self.scaled_grid_size + self.offset_y
+                    surface.blit(scaled_image, (draw_x, draw_y))
+
+    def _draw_furniture(self, surface):
+        for obj in self.level.furniture:
+            if not self.assets.has_tile(decode_gid(obj.gid)[0]):
+                continue
+
+            tile_width = obj.width
+            tile_height = obj.height
+            scaled_width = tile_width * self.scale_factor
+            scaled_height = tile_height * self.scale_factor
+
+            # Căn giữa tile trong không gian của nó
+            tile_width_in_grids = tile_width / self.grid_size
+            tile_height_in_grids = tile_height / self.grid_size
+            offset_x = (self.scaled_grid_size * tile_width_in_grids - scaled_width) / 2
+            offset_y = (self.scaled_grid_size * tile_height_in_grids - scaled_height) / 2
+
+            rotation = obj.rotation
+            scaled_image = self.assets.furniture(obj.gid, (int(scaled_width), int(scaled_height)), rotation)
+
+            draw_x = obj.x * self.scale_factor + self.offset_x + offset_x
+            draw_y = obj.y * self.scale_factor + self.offset_y + offset_y
+            if rotation != 0:
+                rotated_rect = scaled_image.get_rect(center=(draw_x + scaled_width / 2, draw_y + scaled_height / 2))
+                draw_x = rotated_rect.x
+                draw_y = rotated_rect.y
+
+            surface.blit(scaled_image, (draw_x, draw_y))
+
+    # Hình chữ nhật (pixel màn hình) của một ô lưới
+    def cell_rect(self, cell):
+        row, col = cell
+        return pygame.Rect(col * self.scaled_grid_size + self.offset_x,
+                           row * self.scaled_grid_size + self.offset_y,
+                           self.scaled_grid_size, self.scaled_grid_size)
+
+    # Buộc vẽ lại toàn màn hình ở khung hình tiếp theo (ví dụ khi cửa sổ bị che)
+    def invalidate(self):
+        self._full_redraw = True
+
+    # Bắt đầu khung hình: xóa những gì đã vẽ ở khung hình trước bằng nền tĩnh
+    def begin_frame(self, screen):
+        if self._full_redraw:
+            screen.blit(self.background, (0, 0))
+        else:
+            for rect in self._prev_rects:
+                screen.blit(self.background, rect, rect)
+        self._rects = []
+
+    # Vẽ một hình ảnh động và ghi nhận vùng bẩn
+    def blit(self, screen, image, pos):
+        rect = screen.blit(image, pos)
+        self._rects.append(rect)
+        return rect
+
+    # Vẽ viền cho một tập ô (vùng tầm nhìn), ghi nhận một vùng bẩn bao quanh
+    def draw_cell_outlines(self, screen, color, cells, width=2):
+        bounds = None
+        for cell in cells:
+            rect = pygame.draw.rect(screen, color, self.cell_rect(cell), width=width)
+            bounds = rect if bounds is None else bounds.union(rect)
+        if bounds is not None:
+            self._rects.append(bounds)
+        return bounds
+
+    # Kết thúc khung hình: chỉ cập nhật các vùng bẩn lên màn hình (present=False khi vẽ vào
+    # surface ngoài màn hình: chỉ ghi nhận các vùng cần xóa ở khung hình sau)
+    def end_frame(self, present=True):
+        if present:
+            if self._full_redraw:
+                pygame.display.flip()
+            else:
+                pygame.display.update(self._prev_rects + self._rects)
+        self._full_redraw = False
+        self._prev_rects = self._rects
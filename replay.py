@@ -0,0 +1,361 @@
+import argparse
+import hashlib
+import struct
+import sys
+import time
+import zlib
+
+from adversarial import EXPECTIMAX, MINIMAX
+from level import load_level
+from simulation import (CAUGHT, ESCAPED, MASTER_VISION_RANGE, MAX_TICKS, THIEF_VISION_RANGE,
+                        TIMEOUT, Simulation)
+
+# Định dạng file replay: magic, phiên bản, cờ, seed, SHA-1 của file TMX, tham số ván chơi
+# (tầm nhìn trộm, tầm nhìn ông chủ, số bước tối đa, số ông chủ yêu cầu), số ông chủ, khoảng
+# cách keyframe, số bước, số keyframe, kết quả, độ dài đường dẫn bản đồ, vị trí lối ra của ván
+# (bản đồ thiếu lối ra thì lối ra được chọn ngẫu nhiên theo seed)
+REPLAY_MAGIC = b"RPLY"
+REPLAY_VERSION = 2
+REPLAY_HEADER = struct.Struct("<4sHBq20sHHIHHHIIBHHH")
+FLAG_SEEDED = 1
+FLAG_SCHEDULED = 2  # Ván chạy với bộ lập lịch AI theo khung hình: chỉ phát lại được, không chạy lại được
+FLAG_PREDICTIVE = 4  # Ông chủ dùng bộ lập kế hoạch dự đoán (adversarial.py)
+FLAG_EXPECTIMAX = 8  # ... với mô hình trộm expectimax (không có cờ này: minimax)
+FLAG_RISK_AWARE = 16  # Nhân vật trộm tránh vùng nguy hiểm (danger.py)
+
+# Mỗi keyframe lưu toàn bộ trạng thái sau bước đó; tua tới bước bất kỳ chỉ cần giải mã
+# tối đa KEYFRAME_INTERVAL bước từ keyframe gần nhất
+KEYFRAME_INTERVAL = 256
+
+# Mã hướng của mỗi agent trong một bước (4 bit): 0 = đứng yên, 1-4 = lên/xuống/trái/phải.
+# Bước có di chuyển không mã hoá được (nhảy ô) được ghi kèm keyframe
+MOVES = ((0, 0), (-1, 0), (1, 0), (0, -1), (0, 1))
+MOVE_CODES = {move: code for code, move in enumerate(MOVES)}
+DIRECTION_NAMES = (None, "up", "down", "left", "right")
+DIRECTION_CODES = {name: code for code, name in enumerate(DIRECTION_NAMES) if name}
+
+RESULT_CODES = {None: 0, ESCAPED: 1, CAUGHT: 2, TIMEOUT: 3}
+RESULTS = {code: result for result, code in RESULT_CODES.items()}
+
+
+# SHA-1 nội dung file TMX: replay chỉ phát lại đúng trên bản đồ đã ghi
+def map_hash(path):
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).digest()
+
+
+# Trạng thái của ván chơi tại một bước (chỉ những gì replay ghi lại)
+class ReplayState:
+    __slots__ = ("tick", "thief_pos", "guards", "items", "thief_direction", "collected_items")
+
+    def __init__(self, tick, thief_pos, guards, items, thief_direction, collected_items):
+        self.tick = tick
+        self.thief_pos = thief_pos  # (hàng, cột)
+        self.guards = guards  # [(hàng, cột)]
+        self.items = items  # [(hàng, cột)] vật phẩm còn lại
+        self.thief_direction = thief_direction
+        self.collected_items = collected_items
+
+    @classmethod
+    def from_simulation(cls, sim):
+        return cls(sim.tick, tuple(sim.thief_pos), [tuple(pos) for pos in sim.master_positions],
+                   [tuple(item) for item in sim.items], sim.thief_direction, sim.collected_items)
+
+    def copy(self):
+        return ReplayState(self.tick, self.thief_pos, list(self.guards), list(self.items),
+                           self.thief_direction, self.collected_items)
+
+    def __eq__(self, other):
+        return isinstance(other, ReplayState) and all(
+            getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self):
+        return "ReplayState(tick=%d, thief=%s, guards=%s, items=%d)" % (
+            self.tick, self.thief_pos, self.guards, len(self.items))
+
+
+# Một ván đã ghi: tham số để chạy lại (seed, bản đồ), mã hướng của mọi agent ở mỗi bước
+# (codes[tick * agents + k], agent 0 là trộm) và các keyframe {bước: ReplayState}
+class Replay:
+    def __init__(self, map_path, map_digest, seed, params, num_guards,
+                 keyframe_interval=KEYFRAME_INTERVAL, exit_pos=None):
+        self.map_path = map_path
+        self.map_hash = map_digest
+        self.seed = seed
+        self.params = params  # thief_vision_range, master_vision_range, max_ticks, guards
+        self.num_guards = num_guards
+        self.keyframe_interval = keyframe_interval
+        self.exit_pos = exit_pos  # (hàng, cột)
+        self.scheduled = False
+        self.codes = bytearray()
+        self.keyframes = {}
+        self.ticks = 0
+        self.result = None
+
+    @property
+    def agents(self):
+        return 1 + self.num_guards
+
+    # Mã hoá nhị phân: header, keyframe (số nguyên không dấu 16 bit), mã hướng ghép hai
+    # agent vào một byte rồi nén zlib (các đoạn đứng yên/đi thẳng nén rất tốt)
+    def to_bytes(self):
+        params = self.params
+        path = self.map_path.encode("utf-8")
+        header = REPLAY_HEADER.pack(
+            REPLAY_MAGIC, REPLAY_VERSION,
+            self._flags(), self.seed or 0,
+            self.map_hash, params["thief_vision_range"], params["master_vision_range"],
+            params["max_ticks"], params["guards"] or 0, self.num_guards, self.keyframe_interval,
+            self.ticks, len(self.keyframes), RESULT_CODES[self.result], len(path), *self.exit_pos)
+        chunks = [header, path]
+        for tick in sorted(self.keyframes):
+            state = self.keyframes[tick]
+            values = [DIRECTION_CODES[state.thief_direction], state.collected_items, len(state.items)]
+            for pos in [state.thief_pos] + state.guards + state.items:
+                values.extend(pos)
+            chunks.append(struct.pack("<I%dH" % len(values), tick, *values))
+        codes = self.codes
+        if len(codes) % 2:
+            codes = codes + b"\0"
+        packed = bytes(a | b << 4 for a, b in zip(codes[0::2], codes[1::2]))
+        chunks.append(zlib.compress(packed, 9))
+        return b"".join(chunks)
+
+    def _flags(self):
+        flags = (FLAG_SEEDED if self.seed is not None else 0) | (FLAG_SCHEDULED if self.scheduled else 0)
+        if self.params.get("predictive"):
+            flags |= FLAG_PREDICTIVE | (FLAG_EXPECTIMAX if self.params["predictive"] == EXPECTIMAX else 0)
+        if self.params.get("risk_aware"):
+            flags |= FLAG_RISK_AWARE
+        return flags
+
+    @classmethod
+    def from_bytes(cls, blob):
+        (magic, version, flags, seed, digest, thief_vision_range, master_vision_range, max_ticks,
+         guards, num_guards, interval, ticks, num_keyframes, result, path_length,
+         exit_row, exit_col) = REPLAY_HEADER.unpack_from(blob)
+        if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+            raise ValueError("not a replay file (or unsupported version)")
+        offset = REPLAY_HEADER.size
+        map_path = blob[offset:offset + path_length].decode("utf-8")
+        offset += path_length
+        params = {"thief_vision_range": thief_vision_range, "master_vision_range": master_vision_range,
+                  "max_ticks": max_ticks, "guards": guards or None, "predictive": None,
+                  "risk_aware": bool(flags & FLAG_RISK_AWARE)}
+        if flags & FLAG_PREDICTIVE:
+            params["predictive"] = EXPECTIMAX if flags & FLAG_EXPECTIMAX else MINIMAX
+        replay = cls(map_path, digest, seed if flags & FLAG_SEEDED else None, params, num_guards, interval,
+                     (exit_row, exit_col))
+        replay.scheduled = bool(flags & FLAG_SCHEDULED)
+        replay.ticks = ticks
+        replay.result = RESULTS[result]
+
+        for _ in range(num_keyframes):
+            tick, direction, collected, item_count = struct.unpack_from("<I3H", blob, offset)
+            count = 2 * (1 + num_guards + item_count)
+            values = struct.unpack_from("<%dH" % count, blob, offset + 10)
+            offset += 10 + 2 * count
+            cells = list(zip(values[0::2], values[1::2]))
+            replay.keyframes[tick] = ReplayState(tick, cells[0], cells[1:1 + num_guards],
+                                                 cells[1 + num_guards:], DIRECTION_NAMES[direction], collected)
+
+        codes = bytearray()
+        for byte in zlib.decompress(blob[offset:]):
+            codes.append(byte & 15)
+            codes.append(byte >> 4)
+        del codes[ticks * replay.agents:]
+        replay.codes = codes
+        return replay
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+
+# Ghi một ván: gọi record() sau mỗi sim.step(). Keyframe đầu là trạng thái ban đầu (bước 0)
+class ReplayRecorder:
+    def __init__(self, sim, keyframe_interval=KEYFRAME_INTERVAL):
+        self.sim = sim
+        params = {"thief_vision_range": sim.thief_vision_range, "master_vision_range": sim.master_vision_range,
+                  "max_ticks": sim.max_ticks, "guards": sim.num_guards, "predictive": sim.predictive,
+                  "risk_aware": sim.risk_aware}
+        self.replay = Replay(sim.level.path, map_hash(sim.level.path), sim.seed, params,
+                             len(sim.guards), keyframe_interval, tuple(sim.exit_pos))
+        self.replay.scheduled = sim.scheduler is not None
+        self._last = ReplayState.from_simulation(sim)
+        self.replay.keyframes[sim.tick] = self._last
+
+    def record(self):
+        sim, replay = self.sim, self.replay
+        if sim.tick == self._last.tick:
+            return  # Ván đã kết thúc, step() không chạy thêm bước nào
+        state = ReplayState.from_simulation(sim)
+        jumped = False
+        for prev, pos in zip([self._last.thief_pos] + self._last.guards, [state.thief_pos] + state.guards):
+            code = MOVE_CODES.get((pos[0] - prev[0], pos[1] - prev[1]))
+            if code is None:
+                code = 0
+                jumped = True
+            replay.codes.append(code)
+        if jumped or state.tick % replay.keyframe_interval == 0:
+            replay.keyframes[state.tick] = state
+        replay.ticks = state.tick
+        replay.result = sim.result
+        self._last = state
+
+
+# Phát lại một replay không cần chạy mô phỏng: tua tới bước bất kỳ từ keyframe gần nhất
+# rồi cộng dồn các mã hướng
+class ReplayPlayer:
+    def __init__(self, replay):
+        self.replay = replay
+        self.keyframe_ticks = sorted(replay.keyframes)
+        self.state = replay.keyframes[0].copy()
+
+    # Áp dụng bước tiếp theo; trả về trạng thái mới (None nếu đã hết replay)
+    def step(self):
+        replay, state = self.replay, self.state
+        if state.tick >= replay.ticks:
+            return None
+        tick = state.tick + 1
+        keyframe = replay.keyframes.get(tick)
+        if keyframe is not None:
+            self.state = keyframe.copy()
+            return self.state
+        agents = replay.agents
+        base = state.tick * agents
+        codes = replay.codes
+        code = codes[base]
+        if code:
+            dr, dc = MOVES[code]
+            state.thief_pos = (state.thief_pos[0] + dr, state.thief_pos[1] + dc)
+            state.thief_direction = DIRECTION_NAMES[code]
+            if state.thief_pos in state.items:
+                state.items.remove(state.thief_pos)
+                state.collected_items += 1
+        guards = state.guards
+        for k in range(1, agents):
+            code = codes[base + k]
+            if code:
+                dr, dc = MOVES[code]
+                pos = guards[k - 1]
+                guards[k - 1] = (pos[0] + dr, pos[1] + dc)
+        state.tick = tick
+        return state
+
+    # Tua tới bước tick (giới hạn trong [0, số bước]); trả về trạng thái tại bước đó
+    def seek(self, tick):
+        tick = max(0, min(tick, self.replay.ticks))
+        if not self.state.tick <= tick < self.state.tick + self.replay.keyframe_interval:
+            start = 0
+            for keyframe_tick in self.keyframe_ticks:
+                if keyframe_tick > tick:
+                    break
+                start = keyframe_tick
+            self.state = self.replay.keyframes[start].copy()
+        while self.state.tick < tick:
+            self.step()
+        return self.state
+
+    # Chạy nhanh tới hết replay (không giao diện); trả về (số bước, số bước mỗi giây)
+    def fast_forward(self):
+        start_tick = self.state.tick
+        start = time.perf_counter()
+        while self.step() is not None:
+            pass
+        elapsed = time.perf_counter() - start
+        ticks = self.state.tick - start_tick
+        return ticks, ticks / elapsed if elapsed > 0 else float("inf")
+
+
+# Chạy một ván không giao diện với seed cho trước và ghi lại
+def record_episode(level, seed, world=None, keyframe_interval=KEYFRAME_INTERVAL, **params):
+    sim = Simulation(level, seed=seed, world=world, **params)
+    recorder = ReplayRecorder(sim, keyframe_interval)
+    while not sim.game_over:
+        sim.step()
+        recorder.record()
+    return recorder.replay
+
+
+# Chạy lại ván với cùng seed và tham số rồi so với replay từng bước; trả về bước đầu tiên
+# khác nhau (None nếu trùng khớp hoàn toàn)
+def verify(replay, level=None):
+    level = level or load_level(replay.map_path)
+    sim = Simulation(level, seed=replay.seed, **replay.params)
+    player = ReplayPlayer(replay)
+    if ReplayState.from_simulation(sim) != player.state or tuple(sim.exit_pos) != replay.exit_pos:
+        return 0
+    while not sim.game_over:
+        sim.step()
+        if ReplayState.from_simulation(sim) != player.step():
+            return sim.tick
+    return None if player.state.tick == replay.ticks and sim.result == replay.result else sim.tick
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ghi và phát lại ván chơi (seed tất định, định dạng nhị phân gọn)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    record = commands.add_parser("record", help="chạy một ván không giao diện và ghi replay")
+    record.add_argument("map", help="file .tmx")
+    record.add_argument("output", help="file replay cần ghi")
+    record.add_argument("--seed", type=int, default=0)
+    record.add_argument("--max-ticks", type=int, default=MAX_TICKS)
+    record.add_argument("--thief-vision-range", type=int, default=THIEF_VISION_RANGE)
+    record.add_argument("--master-vision-range", type=int, default=MASTER_VISION_RANGE)
+    record.add_argument("--guards", type=int, default=None, help="số ông chủ (mặc định: theo bản đồ)")
+    record.add_argument("--keyframe-interval", type=int, default=KEYFRAME_INTERVAL)
+    record.add_argument("--predictive", choices=(MINIMAX, EXPECTIMAX), default=None,
+                        help="ông chủ đang đuổi bắt đoán trước nước đi của trộm")
+    record.add_argument("--risk-aware", action="store_true", help="nhân vật trộm tránh tầm nhìn của ông chủ")
+    play = commands.add_parser("play", help="tua tới một bước hoặc chạy nhanh tới hết replay")
+    play.add_argument("replay")
+    play.add_argument("--seek", type=int, default=None, help="in trạng thái tại bước này")
+    verify_parser = commands.add_parser("verify", help="chạy lại ván theo seed và so với replay")
+    verify_parser.add_argument("replay")
+    args = parser.parse_args(argv)
+
+    if args.command == "record":
+        level = load_level(args.map)
+        replay = record_episode(level, args.seed, keyframe_interval=args.keyframe_interval,
+                                max_ticks=args.max_ticks, thief_vision_range=args.thief_vision_range,
+                                master_vision_range=args.master_vision_range, guards=args.guards,
+                                predictive=args.predictive, risk_aware=args.risk_aware)
+        replay.save(args.output)
+        size = len(replay.to_bytes())
+        print("%s: %d ticks, %s, %d bytes (%.2f bytes/tick)" % (
+            args.output, replay.ticks, replay.result, size, size / max(replay.ticks, 1)))
+        return 0
+
+    replay = Replay.load(args.replay)
+    if map_hash(replay.map_path) != replay.map_hash:
+        print("Warning: %s has changed since the replay was recorded" % replay.map_path)
+    if args.command == "verify":
+        if replay.scheduled or replay.seed is None:
+            print("%s: recorded with time-budgeted AI jobs or without a seed, cannot be re-simulated" % args.replay)
+            return 1
+        tick = verify(replay)
+        if tick is None:
+            print("%s: deterministic, %d ticks match" % (args.replay, replay.ticks))
+            return 0
+        print("%s: diverged at tick %d" % (args.replay, tick))
+        return 1
+
+    player = ReplayPlayer(replay)
+    print("%s: map %s, seed %s, %d guards, %d ticks, %s" % (
+        args.replay, replay.map_path, replay.seed, replay.num_guards, replay.ticks, replay.result))
+    if args.seek is not None:
+        print(player.seek(args.seek))
+        return 0
+    ticks, rate = player.fast_forward()
+    print("fast-forward: %d ticks (%.0f ticks/s)" % (ticks, rate))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+from flowfield import UNREACHABLE
+from scheduler import run_job
+
+# Số vật phẩm tối đa giải chính xác bằng quy hoạch động bitmask (O(2^n * n^2))
+EXACT_LIMIT = 10
+
+# Số lộ trình giữ lại trong cache
+ROUTE_CACHE_SIZE = 1024
+
+# Chi phí của đoạn không đi được (đủ lớn để luôn bị tránh nếu có lựa chọn khác)
+NO_PATH = 10 ** 9
+
+
+# Tổng độ dài lộ trình start -> order[0] -> ... -> order[-1] -> exit (theo chỉ số ma trận)
+def route_length(order, start_cost, dist, exit_cost):
+    if not order:
+        return 0
+    total = start_cost[order[0]] + exit_cost[order[-1]]
+    for a, b in zip(order, order[1:]):
+        total += dist[a][b]
+    return total
+
+
+# Quy hoạch động bitmask (Held-Karp) với điểm đầu và điểm cuối cố định
+def solve_exact(start_cost, dist, exit_cost):
+    n = len(start_cost)
+    if n == 0:
+        return []
+    full = (1 << n) - 1
+    best = [[NO_PATH * (n + 2)] * n for _ in range(1 << n)]
+    parent = [[-1] * n for _ in range(1 << n)]
+    for i in range(n):
+        best[1 << i][i] = start_cost[i]
+    for mask in range(1, full + 1):
+        row = best[mask]
+        for last in range(n):
+            cost = row[last]
+            if not (mask >> last) & 1 or cost >= NO_PATH * (n + 2):
+                continue
+            dist_last = dist[last]
+            for nxt in range(n):
+                if (mask >> nxt) & 1:
+                    continue
+                new_mask = mask | (1 << nxt)
+                new_cost = cost + dist_last[nxt]
+                if new_cost < best[new_mask][nxt]:
+                    best[new_mask][nxt] = new_cost
+                    parent[new_mask][nxt] = last
+    last = min(range(n), key=lambda i: best[full][i] + exit_cost[i])
+    order = []
+    mask = full
+    while last != -1:
+        order.append(last)
+        prev = parent[mask][last]
+        mask ^= 1 << last
+        last = prev
+    order.reverse()
+    return order
+
+
+# Heuristic cho nhiều vật phẩm: láng giềng gần nhất rồi cải thiện bằng 2-opt
+def solve_heuristic(start_cost, dist, exit_cost):
+    n = len(start_cost)
+    remaining = set(range(n))
+    order = []
+    current = None
+    while remaining:
+        if current is None:
+            nxt = min(remaining, key=lambda i: start_cost[i])
+        else:
+            nxt = min(remaining, key=lambda i: dist[current][i])
+        order.append(nxt)
+        remaining.remove(nxt)
+        current = nxt
+
+    improved = True
+    while improved:
+        improved = False
+        for i in range(n - 1):
+            for j in range(i + 1, n):
+                # Đảo đoạn order[i..j]: chỉ hai cạnh ở hai đầu đoạn thay đổi (ma trận đối xứng)
+                before = start_cost[order[i]] if i == 0 else dist[order[i - 1]][order[i]]
+                after = exit_cost[order[j]] if j == n - 1 else dist[order[j]][order[j + 1]]
+                new_before = start_cost[order[j]] if i == 0 else dist[order[i - 1]][order[j]]
+                new_after = exit_cost[order[i]] if j == n - 1 else dist[order[i]][order[j + 1]]
+                if new_before + new_after < before + after:
+                    order[i:j + 1] = reversed(order[i:j + 1])
+                    improved = True
+    return order
+
+
+# Lập thứ tự nhặt vật phẩm tối ưu. Khoảng cách lấy từ trường khoảng cách BFS của
+# từng vật phẩm và lối ra (cũng là trường mà nhân vật trộm dùng để di chuyển);
+# lưới không hướng nên khoảng cách từ điểm xuất phát đọc ngay trên các trường đó.
+class RoutePlanner:
+    def __init__(self, fields, exact_limit=EXACT_LIMIT):
+        self.fields = fields
+        self.exact_limit = exact_limit
+        self.routes = {}  # (xuất phát, vật phẩm, lối ra) -> thứ tự đã lập
+
+    def _distance(self, field, pos):
+        d = int(field.dist[pos[0], pos[1]])
+        return NO_PATH if d == UNREACHABLE else d
+
+    # Ma trận khoảng cách: (xuất phát -> vật phẩm, vật phẩm <-> vật phẩm, vật phẩm -> lối ra)
+    def distance_matrix(self, start, items, exit_pos):
+        return run_job(self.distance_matrix_job(start, items, exit_pos))
+
+    # distance_matrix dạng tác vụ cho JobScheduler: các trường chưa có được tính dần
+    def distance_matrix_job(self, start, items, exit_pos):
+        item_fields = []
+        for item in items:
+            item_fields.append((yield from self.fields.job(item)))
+        exit_field = yield from self.fields.job(exit_pos)
+        start_cost = [self._distance(field, start) for field in item_fields]
+        dist = [[self._distance(field, other) for other in items] for field in item_fields]
+        exit_cost = [self._distance(exit_field, item) for item in items]
+        return start_cost, dist, exit_cost
+
+    # Thứ tự vật phẩm (danh sách ô) cần nhặt từ start trước khi tới lối ra
+    def plan(self, start, items, exit_pos):
+        return run_job(self.plan_job(start, items, exit_pos))
+
+    # plan() dạng tác vụ cho JobScheduler
+    def plan_job(self, start, items, exit_pos):
+        key = (tuple(start), tuple(tuple(item) for item in items), tuple(exit_pos))
+        route = self.routes.get(key)
+        if route is None:
+            start_cost, dist, exit_cost = yield from self.distance_matrix_job(start, items, exit_pos)
+            if len(items) <= self.exact_limit:
+                order = solve_exact(start_cost, dist, exit_cost)
+            else:
+                order = solve_heuristic(start_cost, dist, exit_cost)
+            route = [list(items[i]) for i in order]
+            if len(self.routes) >= ROUTE_CACHE_SIZE:
+                self.routes.clear()
+            self.routes[key] = route
+        return [item[:] for item in route]
@@ -0,0 +1,65 @@
+import time
+from collections import OrderedDict
+
+# Thời gian (giây) dành cho các tác vụ AI trong mỗi khung hình
+FRAME_BUDGET = 0.004
+
+# Giá trị trả về khi tác vụ chưa xong
+PENDING = object()
+
+# Số kết quả chưa được lấy giữ lại tối đa (kết quả cũ nhất bị bỏ)
+RESULT_LIMIT = 256
+
+
+# Chạy một tác vụ (generator) đến hết ngay lập tức; trả về kết quả của nó
+def run_job(job):
+    try:
+        while True:
+            next(job)
+    except StopIteration as stop:
+        return stop.value
+
+
+# Bộ lập lịch tác vụ AI: mỗi tác vụ là một generator tự nhường (yield) sau từng phần việc
+# nhỏ, kết quả là giá trị return. Mỗi khung hình chạy xoay vòng các tác vụ cho tới khi hết
+# ngân sách thời gian, nên một lần tìm đường dài được chia ra nhiều khung hình.
+class JobScheduler:
+    def __init__(self, budget=FRAME_BUDGET):
+        self.budget = budget
+        self.jobs = OrderedDict()  # khoá -> generator đang chạy
+        self.results = OrderedDict()  # khoá -> kết quả chưa được lấy
+        self.completed = 0  # Số tác vụ đã xong (để đo)
+
+    @property
+    def pending(self):
+        return len(self.jobs)
+
+    # Kết quả của tác vụ khoá key nếu đã xong (lấy ra một lần); nếu chưa có thì tạo tác vụ bằng
+    # factory() (chỉ một lần cho mỗi khoá) và trả về PENDING
+    def request(self, key, factory):
+        if key in self.results:
+            return self.results.pop(key)
+        if key not in self.jobs:
+            self.jobs[key] = factory()
+        return PENDING
+
+    def cancel(self, key):
+        self.jobs.pop(key, None)
+        self.results.pop(key, None)
+
+    # Chạy các tác vụ trong tối đa budget giây (mặc định: ngân sách của bộ lập lịch)
+    def run(self, budget=None):
+        budget = self.budget if budget is None else budget
+        deadline = time.perf_counter() + budget
+        while self.jobs:
+            for key in list(self.jobs):
+                try:
+                    next(self.jobs[key])
+                except StopIteration as stop:
+                    del self.jobs[key]
+                    self.results[key] = stop.value
+                    self.completed += 1
+                    if len(self.results) > RESULT_LIMIT:
+                        self.results.popitem(last=False)
+                if time.perf_counter() >= deadline:
+                    return
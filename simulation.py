@@ -0,0 +1,477 @@
+import random
+
+import numpy as np
+
+from adversarial import SEARCH_BUDGET, SEARCH_GUARDS, PredictivePlanner
+from danger import DangerMap
+from flowfield import FIELD_CACHE_SIZE, FlowFieldCache
+from guards import CooperativePlanner, Guard, SpatialHash
+from instrumentation import Profiler
+from patrol import PATROL_STALE_TICKS, PatrolRoutes
+from pathfinding import IncrementalPlanner, build_neighbors
+from route import RoutePlanner
+from scheduler import PENDING, run_job
+from vision import MASTER_VISION_RANGE, THIEF_VISION_RANGE, VisionSystem
+from walkability import WalkGrid
+
+# Hệ số kích thước hitbox của nhân vật so với một ô
+THIEF_SCALE_FACTOR = 1.0
+MASTER_SCALE_FACTOR = THIEF_SCALE_FACTOR  # Hitbox của master bằng với thief
+
+# Ông chủ xuất hiện ngẫu nhiên cách trộm và lối ra ít nhất chừng này bước (theo đường đi)
+SPAWN_MIN_DISTANCE = 8
+
+# Số bước tối đa của một ván (tránh ván không bao giờ kết thúc khi chạy không giao diện)
+MAX_TICKS = 2000
+
+# Kết quả một ván
+ESCAPED = "escaped"
+CAUGHT = "caught"
+TIMEOUT = "timeout"
+
+
+# Hướng di chuyển từ ô a sang ô kề b
+def move_direction(a, b, default):
+    dx = b[0] - a[0]
+    dy = b[1] - a[1]
+    if dx == -1:
+        return "up"
+    elif dx == 1:
+        return "down"
+    elif dy == -1:
+        return "left"
+    elif dy == 1:
+        return "right"
+    return default
+
+
+# Dữ liệu tĩnh của một màn chơi dùng chung cho mọi ván trên màn đó: lưới đi được,
+# bộ tìm đường, tầm nhìn và cache trường khoảng cách (chỉ phụ thuộc bản đồ)
+class World:
+    def __init__(self, level, thief_vision_range=THIEF_VISION_RANGE, master_vision_range=MASTER_VISION_RANGE):
+        self.level = level
+        self.map_grid = [row[:] for row in level.wall_grid]
+        furniture_rects = level.furniture_rects()
+        cell = level.tile_width
+        self.thief_walk_grid = WalkGrid(self.map_grid, furniture_rects, cell, cell * THIEF_SCALE_FACTOR)
+        if MASTER_SCALE_FACTOR == THIEF_SCALE_FACTOR:
+            self.master_walk_grid = self.thief_walk_grid
+        else:
+            self.master_walk_grid = WalkGrid(self.map_grid, furniture_rects, cell, cell * MASTER_SCALE_FACTOR)
+        self.master_neighbors = build_neighbors(self.master_walk_grid)
+        if self.thief_walk_grid is self.master_walk_grid:
+            self.thief_neighbors = self.master_neighbors
+        else:
+            self.thief_neighbors = build_neighbors(self.thief_walk_grid)
+        self.vision = VisionSystem(self.map_grid, thief_vision_range, master_vision_range)
+        # Trường khoảng cách dùng chung theo đích: tới vật phẩm/lối ra cho trộm, tới trộm khi đuổi bắt
+        # (đủ chỗ cho trường của mọi vật phẩm và lối ra để lập lộ trình không phải tính lại)
+        self.thief_fields = FlowFieldCache(self.thief_walk_grid, FIELD_CACHE_SIZE + len(level.items) + 1)
+        self.master_fields = FlowFieldCache(self.master_walk_grid)
+        self.route_planner = RoutePlanner(self.thief_fields)
+        self.patrols = PatrolRoutes(self.master_walk_grid, level.master_positions)
+        self._free_cells = {}
+
+    # Các ô trống (hàng, cột) của một lưới đi được, tính một lần
+    def free_cells(self, walk_grid):
+        cells = self._free_cells.get(id(walk_grid))
+        if cells is None:
+            cells = [(r, c) for r in range(walk_grid.rows) for c in range(walk_grid.cols)
+                     if walk_grid.is_free(r, c)]
+            self._free_cells[id(walk_grid)] = cells
+        return cells
+
+
+# Logic một ván chơi (di chuyển, tầm nhìn, tuần tra/đuổi bắt, nhặt vật phẩm,
+# thắng/thua) tách khỏi giao diện: không cần pygame, gọi step() để chạy từng bước.
+# Toạ độ va chạm tính theo pixel bản đồ gốc nên không phụ thuộc kích thước cửa sổ.
+class Simulation:
+    def __init__(self, level, seed=None, thief_vision_range=THIEF_VISION_RANGE,
+                 master_vision_range=MASTER_VISION_RANGE, max_ticks=MAX_TICKS, verbose=False, world=None,
+                 guards=None, profiler=None, scheduler=None, predictive=None, risk_aware=False):
+        self.level = level
+        self.rows = level.rows
+        self.cols = level.cols
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.thief_vision_range = thief_vision_range
+        self.master_vision_range = master_vision_range
+        self.max_ticks = max_ticks
+        self.verbose = verbose
+        self.num_guards = guards  # Số ông chủ (None = theo bản đồ); thiếu thì thêm ở ô trống ngẫu nhiên
+        self.profiler = profiler or Profiler()  # Mặc định tắt: không đo, không in
+        # Bộ lập lịch tác vụ AI (JobScheduler); None = mọi lần tìm đường chạy xong ngay trong step()
+        self.scheduler = scheduler
+        # Ông chủ đang đuổi bắt đoán trước nước đi của trộm (adversarial.py): None (tắt),
+        # "minimax" hoặc "expectimax"
+        self.predictive = predictive
+        # Nhân vật trộm tránh vùng ông chủ đang/vừa nhìn thấy (danger.py) thay vì đi đường ngắn nhất
+        self.risk_aware = risk_aware
+
+        self.world = world or World(level, thief_vision_range, master_vision_range)
+        self.map_grid = self.world.map_grid
+        self.thief_walk_grid = self.world.thief_walk_grid
+        self.master_walk_grid = self.world.master_walk_grid
+        self.vision = self.world.vision
+        self.thief_fields = self.world.thief_fields
+        self.master_fields = self.world.master_fields
+        self.route_planner = self.world.route_planner
+
+        self.reset()
+
+    def _log(self, message):
+        if self.verbose:
+            print(message)
+
+    # Ô trống ngẫu nhiên (theo seed) dùng khi bản đồ thiếu đối tượng
+    def _random_free_cell(self, walk_grid, exclude=()):
+        return self._random_cell(self.world.free_cells(walk_grid), exclude)
+
+    # Hết ô trong cells (trừ exclude) thì chọn trong fallback
+    def _random_cell(self, cells, exclude=(), fallback=None):
+        excluded = {(pos[0], pos[1]) for pos in exclude}
+        free = [cell for cell in cells if (cell[0], cell[1]) not in excluded]
+        if not free and fallback is not None:
+            return self._random_cell(fallback, exclude)
+        return list(self.rng.choice(free)) if free else [1, 1]
+
+    # Các ô trong cells cách trộm và lối ra ít nhất SPAWN_MIN_DISTANCE bước theo đường đi của ông
+    # chủ (ô không tới được coi là đủ xa); bản đồ nhỏ không đủ count ô như vậy thì hạ ngưỡng xuống
+    # để vẫn còn count ô xa nhất
+    def _far_cells(self, cells, count=1):
+        if not cells:
+            return []
+        away = np.minimum(self.master_fields.get(self.thief_pos).dist, self.master_fields.get(self.exit_pos).dist)
+        rows, cols = zip(*cells)
+        distances = np.sort(away[rows, cols])
+        threshold = min(SPAWN_MIN_DISTANCE, int(distances[-min(count, len(distances))]))
+        return [cell for cell in cells if away[cell[0], cell[1]] >= threshold]
+
+    # Đưa ván chơi về trạng thái ban đầu
+    def reset(self):
+        level = self.level
+        taken = []
+        if level.thief_pos is None:
+            self._log("Warning: Thief position not found in the map! Using a random free position.")
+            self.thief_pos = self._random_free_cell(self.thief_walk_grid)
+        else:
+            # Kiểm tra và điều chỉnh vị trí khởi tạo của thief
+            self.thief_pos = self.find_nearest_free_position(level.thief_pos, self.thief_walk_grid)
+        taken.append(self.thief_pos)
+
+        self.items = [item[:] for item in level.items]
+        if not self.items:
+            self._log("Warning: No items found in the map! Adding a random item.")
+            self.items.append(self._random_free_cell(self.thief_walk_grid, taken))
+        taken.extend(self.items)
+
+        if level.exit_pos is None:
+            self._log("Warning: Exit position not found in the map! Using a random free position.")
+            self.exit_pos = self._random_free_cell(self.thief_walk_grid, taken)
+        else:
+            self.exit_pos = level.exit_pos[:]
+
+        # Mỗi đối tượng "master" trong bản đồ là một ông chủ
+        spawns = level.master_positions[:self.num_guards]
+        if not spawns:
+            self._log("Warning: Master position not found in the map! Using a random free position.")
+        self.guards = []
+        self.guard_hash = SpatialHash()
+        self.cooperative = CooperativePlanner(self.master_walk_grid, neighbors=self.world.master_neighbors)
+        self.patrol_visits = [-PATROL_STALE_TICKS] * len(self.world.patrols.points)  # Bước cuối cùng mỗi điểm được ghé
+        self.predictor = None
+        if self.predictive:
+            # Có bộ lập lịch (chơi có giao diện): giới hạn thời gian mỗi bước; không có thì chỉ
+            # giới hạn số nút để ván chơi tất định
+            self.predictor = PredictivePlanner(self.world.master_neighbors, self.world.thief_neighbors,
+                                               thief_model=self.predictive,
+                                               budget=SEARCH_BUDGET if self.scheduler is not None else None)
+        far = None
+        count = max(self.num_guards or len(spawns), 1)
+        while len(self.guards) < count:
+            if len(self.guards) < len(spawns):
+                # Kiểm tra và điều chỉnh vị trí khởi tạo của master
+                pos = self.find_nearest_free_position(spawns[len(self.guards)], self.master_walk_grid)
+            else:
+                # Ông chủ thêm chỉ xuất hiện ở vùng tới được vòng tuần tra, không quá gần trộm và
+                # lối ra (bản đồ quá nhỏ thì ở các ô xa nhất)
+                if far is None:
+                    far = self._far_cells(self.world.patrols.cells, count - len(self.guards))
+                pos = self._random_cell(far, taken, self.world.patrols.cells)
+            taken.append(pos)
+            guard = Guard(len(self.guards), pos)
+            self.guards.append(guard)
+            self.guard_hash.insert(guard.index, pos)
+
+        self.danger = None
+        self.risk_planner = None
+        if self.risk_aware:
+            self.danger = DangerMap(self.vision, self.rows, self.cols)
+            self.danger.update(self.master_positions, 0)
+            self.risk_planner = IncrementalPlanner(self.thief_walk_grid, self.world.thief_neighbors, self.danger.cost)
+
+        self.thief_direction = "right"  # Hướng mặc định của nhân vật trộm
+        self.collected_items = 0
+        self.route = None  # Thứ tự nhặt vật phẩm còn lại
+        self.thief_field = None  # Trường khoảng cách trộm đang đi theo
+        self._slots = {}  # tên -> khoá tác vụ đang chờ (tác vụ cũ bị huỷ khi khoá đổi)
+        self.tick = 0
+        self.result = None
+
+    @property
+    def game_over(self):
+        return self.result is not None
+
+    # Vị trí của ông chủ đầu tiên (giữ tương thích với giao diện một ông chủ)
+    @property
+    def master_pos(self):
+        return self.guards[0].pos
+
+    @property
+    def master_positions(self):
+        return [guard.pos for guard in self.guards]
+
+    @property
+    def master_chasing(self):
+        return any(guard.chasing for guard in self.guards)
+
+    # Hàm tìm vị trí gần nhất không va chạm (tra bảng BFS đa nguồn, O(1))
+    def find_nearest_free_position(self, start_pos, walk_grid):
+        free_pos = walk_grid.nearest_free(start_pos)
+        if free_pos is None:
+            # Nếu không tìm thấy vị trí nào, trả về vị trí mặc định
+            self._log("Warning: Could not find a free position!")
+            return [1, 1]
+        return free_pos
+
+    # Kết quả của một tác vụ AI (generator): chạy xong ngay nếu không có bộ lập lịch, ngược lại
+    # gửi cho bộ lập lịch và trả về PENDING cho tới khi xong. Mỗi slot chỉ giữ một tác vụ:
+    # yêu cầu với khoá mới huỷ tác vụ cũ chưa xong của slot đó.
+    def _request(self, key, factory, slot=None):
+        if self.scheduler is None:
+            return run_job(factory())
+        if slot is not None:
+            previous = self._slots.get(slot)
+            if previous is not None and previous != key:
+                self.scheduler.cancel(previous)
+            self._slots[slot] = key
+        return self.scheduler.request(key, factory)
+
+    # Trường khoảng cách tới goal: lấy từ cache hoặc tính (qua bộ lập lịch nếu có)
+    def _field(self, fields, name, goal, slot=None):
+        field = fields.cached(goal)
+        if field is None:
+            field = self._request((name, goal[0], goal[1]), lambda: fields.job(goal), slot)
+        return field
+
+    # Bước tiếp theo của nhân vật trộm: đọc trường khoảng cách tới đích (chỉ tính lại khi đích đổi)
+    def thief_next_step(self, goal):
+        if self.risk_planner is not None:
+            return self.thief_risk_step(goal)
+        field = self._field(self.thief_fields, "thief", goal, "thief")
+        if field is PENDING:
+            # Chờ trường khoảng cách mới: đi tiếp theo trường cũ (nếu có)
+            field = self.thief_field
+            return field.next_step(self.thief_pos) if field is not None else None
+        self.thief_field = field
+        return field.next_step(self.thief_pos)
+
+    # Bước tiếp theo tránh nguy hiểm: cập nhật bản đồ nguy hiểm theo vị trí hiện tại của các ông chủ
+    # và chỉ tìm lại phần đường đi bị ảnh hưởng
+    def thief_risk_step(self, goal):
+        planner = self.risk_planner
+        with self.profiler.timer("danger"):
+            changed = self.danger.update(self.master_positions, self.tick)
+        self.profiler.count("danger_changed", len(changed))
+        planner.update_costs(changed)
+        step = planner.next_step(self.thief_pos, goal)
+        self.profiler.count("nodes_expanded", planner.nodes_expanded)
+        return step
+
+    # Các ông chủ đang nhìn thấy nhân vật trộm: spatial hash chỉ trả về những ông chủ
+    # trong tầm nhìn nên chi phí không tăng theo tổng số ông chủ
+    def guards_seeing(self, thief_pos=None):
+        thief_pos = thief_pos or self.thief_pos
+        guards = self.guards
+        return [i for i in self.guard_hash.near(thief_pos, self.master_vision_range)
+                if self.vision.master_sees(guards[i].pos, thief_pos)]
+
+    # Kiểm tra nhân vật trộm có trong tầm nhìn của ông chủ (bất kỳ, hoặc tại master_pos) không
+    def master_vision(self, master_pos=None, thief_pos=None):
+        if master_pos is not None:
+            return self.vision.master_sees(master_pos, thief_pos or self.thief_pos)
+        return bool(self.guards_seeing(thief_pos))
+
+    def thief_vision_zone(self):
+        return self.vision.thief_zone(self.thief_pos, self.thief_direction)
+
+    # Hợp các zone tầm nhìn của mọi ông chủ
+    def master_vision_zone(self):
+        if len(self.guards) == 1:
+            return self.vision.master_zone(self.guards[0].pos)
+        return frozenset().union(*(self.vision.master_zone(guard.pos) for guard in self.guards))
+
+    # AI tuần tra cho ông chủ: đi theo vòng tuần tra dựng sẵn của màn (patrol.py), trả về trường
+    # khoảng cách (tính sẵn) tới điểm tiếp theo trên vòng; None nếu không tới được điểm nào
+    def master_patrol(self, guard):
+        patrols = self.world.patrols
+        if guard.circuit is None:
+            entered = patrols.enter(guard.pos, self.patrol_visits, self.tick, self.rng)
+            if entered is None:
+                return None
+            guard.circuit, guard.circuit_index, guard.circuit_step = entered
+        point = guard.circuit[guard.circuit_index]
+        if guard.pos == patrols.points[point]:
+            self.patrol_visits[point] = self.tick
+            if len(guard.circuit) == 1:
+                return None
+            guard.circuit_index = (guard.circuit_index + guard.circuit_step) % len(guard.circuit)
+            point = guard.circuit[guard.circuit_index]
+        return patrols.fields[point]
+
+    # Đuổi theo: trường khoảng cách tới vị trí hiện tại của trộm, dùng chung cho mọi ông chủ
+    # (None khi đang chờ bộ lập lịch: các ông chủ giữ trường cũ)
+    def master_chase(self):
+        field = self._field(self.master_fields, "master", self.thief_pos, "chase")
+        return None if field is PENDING else field
+
+    # Nước đi dự đoán cho tối đa SEARCH_GUARDS ông chủ gần trộm nhất trong số đang nhìn thấy trộm;
+    # trả về {chỉ số ông chủ: ô tiếp theo} (rỗng nếu tìm kiếm chưa xong độ sâu nào)
+    def predict_guards(self, seeing):
+        cols = self.cols
+        thief = self.thief_pos
+        chosen = sorted(seeing, key=lambda i: (abs(self.guards[i].pos[0] - thief[0]) +
+                                               abs(self.guards[i].pos[1] - thief[1]), i))[:SEARCH_GUARDS]
+        goal = self.thief_goal()
+        field = self.thief_fields.cached(goal)
+        moves = self.predictor.decide([self.guards[i].pos[0] * cols + self.guards[i].pos[1] for i in chosen],
+                                      thief[0] * cols + thief[1],
+                                      field.dist.reshape(-1) if field is not None else None,
+                                      goal[0] * cols + goal[1])
+        self.profiler.count("search_nodes", self.predictor.nodes)
+        if moves is None:
+            return {}
+        return {i: list(divmod(cell, cols)) for i, cell in zip(chosen, moves)}
+
+    # Mục tiêu hiện tại của nhân vật trộm: vật phẩm tiếp theo theo lộ trình tối ưu hoặc lối ra.
+    # Lộ trình chỉ lập lại khi tập vật phẩm đổi ngoài dự kiến (ví dụ nhặt được vật phẩm khác trên đường)
+    def thief_goal(self):
+        if not self.items:
+            return self.exit_pos
+        if not self.route or len(self.route) != len(self.items) or self.route[0] not in self.items:
+            start, items = self.thief_pos[:], [item[:] for item in self.items]
+            route = self._request("route", lambda: self.route_planner.plan_job(start, items, self.exit_pos))
+            if route is PENDING or sorted(route) != sorted(self.items):
+                # Trong lúc chờ (hoặc lộ trình vừa xong đã cũ) đi tiếp theo lộ trình cũ còn hợp lệ
+                remaining = [item for item in self.route or () if item in self.items]
+                return remaining[0] if remaining else self.items[0]
+            self.route = route
+        return self.route[0]
+
+    # Chạy một bước của ván chơi; trả về kết quả nếu ván vừa kết thúc
+    def step(self):
+        if self.result is not None:
+            return self.result
+        self.tick += 1
+
+        # Tìm mục tiêu và di chuyển nhân vật trộm
+        with self.profiler.timer("thief"):
+            next_pos = self.thief_next_step(self.thief_goal())
+        # Kiểm tra va chạm với đồ nội thất trước khi di chuyển (để chắc chắn)
+        if next_pos is not None and not self.thief_walk_grid.collides(next_pos):
+            self.thief_direction = move_direction(self.thief_pos, next_pos, self.thief_direction)
+            self.thief_pos = next_pos
+
+            if self.thief_pos in self.items:
+                self.items.remove(self.thief_pos)
+                self.collected_items += 1
+                if self.route and self.route[0] == self.thief_pos:
+                    self.route.pop(0)
+            if self.thief_pos == self.exit_pos and not self.items:
+                self._log("Tên trộm đã thoát!")
+                self.result = ESCAPED
+                return self.result
+
+        # Di chuyển các ông chủ
+        self.move_guards()
+
+        if self.guard_hash.at(self.thief_pos):
+            self._log("Bị ông chủ bắt!")
+            self.result = CAUGHT
+        elif self.tick >= self.max_ticks:
+            self.result = TIMEOUT
+        return self.result
+
+    # Di chuyển mọi ông chủ một bước. Mỗi ông chủ đi theo trường khoảng cách tới đích
+    # (trường đuổi bắt tới trộm dùng chung), còn các bước cụ thể được lập bằng cooperative
+    # A* có cửa sổ và đặt chỗ trong bảng chung để các ông chủ không đụng nhau; chỉ lập lại
+    # khi đích đổi hoặc đã đi hết nửa cửa sổ.
+    def move_guards(self):
+        t = self.tick
+        profiler = self.profiler
+        with profiler.timer("vision"):
+            seeing = set(self.guards_seeing())
+        with profiler.timer("chase"):
+            chase_field = self.master_chase() if seeing else None
+        predicted = {}
+        if self.predictor is not None and seeing:
+            with profiler.timer("predictive"):
+                predicted = self.predict_guards(seeing)
+        half_window = self.cooperative.window // 2
+        for guard in self.guards:
+            replan = False
+            guard.chasing = guard.index in seeing
+            if guard.chasing:
+                guard.circuit = None  # Hết đuổi bắt thì vào lại vòng tuần tra từ vị trí mới
+            if guard.index in predicted:
+                # Đi theo nước dự đoán; giữ trường đuổi bắt để tới vị trí cuối cùng thấy trộm khi mất dấu
+                if chase_field is not None:
+                    guard.field = chase_field
+                self.cooperative.table.release(guard.index)
+                guard.plan = []
+                next_pos = predicted[guard.index]
+                if (next_pos != guard.pos and not self.master_walk_grid.collides(next_pos) and
+                        not self.guard_hash.at(next_pos)):
+                    guard.pos = next_pos
+                    self.guard_hash.move(guard.index, next_pos)
+                continue
+            if guard.chasing and chase_field is not None:
+                # Đuổi theo (hoặc đi tới vị trí cuối cùng nhìn thấy trộm)
+                if guard.field is not chase_field:
+                    guard.field = chase_field
+                    replan = True
+            elif guard.field is not None and guard.pos == guard.field.goal:
+                guard.field = None
+            if guard.field is None:
+                with profiler.timer("patrol"):
+                    guard.field = self.master_patrol(guard)
+                if guard.field is None:
+                    continue
+                replan = True
+
+            k = t - guard.plan_tick
+            if replan or k + 1 >= len(guard.plan) or k >= half_window:
+                expanded = self.cooperative.nodes_expanded
+                with profiler.timer("cooperative"):
+                    guard.plan = self.cooperative.plan(guard.index, guard.pos, guard.field, t)
+                profiler.count("nodes_expanded", self.cooperative.nodes_expanded - expanded)
+                guard.plan_tick = t
+                k = 0
+            if k + 1 >= len(guard.plan):
+                continue
+            next_pos = guard.plan[k + 1]
+            if next_pos == guard.pos:
+                continue
+            # Kiểm tra va chạm với đồ nội thất và ông chủ khác trước khi di chuyển (để chắc chắn)
+            if not self.master_walk_grid.collides(next_pos) and not self.guard_hash.at(next_pos):
+                guard.pos = next_pos
+                self.guard_hash.move(guard.index, next_pos)
+            else:
+                # Nếu có va chạm, tìm đường mới
+                guard.plan = []
+
+    # Chạy đến hết ván; trả về (kết quả, số bước)
+    def run(self):
+        while self.result is None:
+            self.step()
+        return self.result, self.tick
@@ -0,0 +1,12 @@
+import os
+import sys
+
+# Các module của game nằm ở thư mục gốc của repo
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO not in sys.path:
+    sys.path.insert(0, REPO)
+
+
+# Đường dẫn tuyệt đối tới một bản đồ đi kèm
+def map_path(name):
+    return os.path.join(REPO, "map", name)
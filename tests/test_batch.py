@@ -0,0 +1,62 @@
+import pytest
+
+from batch import run_batch
+from conftest import map_path
+from level import load_level
+from replay import RESULT_CODES
+from simulation import CAUGHT, SPAWN_MIN_DISTANCE, Simulation, World
+from vecenv import VectorEnv
+
+MAPS = [map_path("%d.tmx" % i) for i in range(1, 6)]
+
+
+@pytest.mark.parametrize("params", [{}, {"guards": 6}, {"predictive": "minimax"}, {"predictive": "expectimax"},
+                                    {"predictive": "minimax", "guards": 2}, {"predictive": "expectimax", "guards": 3},
+                                    {"risk_aware": True}, {"predictive": "minimax", "risk_aware": True}],
+                         ids=lambda p: ",".join("%s=%s" % item for item in p.items()) or "default")
+def test_seeded_batch_is_deterministic(params):
+    first, _, total = run_batch(MAPS, 3, seed=11, workers=1, params=dict(params, max_ticks=400))
+    second, _, _ = run_batch(MAPS, 3, seed=11, workers=1, params=dict(params, max_ticks=400))
+    assert total == 15
+    for path in MAPS:
+        assert len(first[path]["ticks"]) == 3
+        assert first[path] == second[path]
+
+
+def test_random_guards_spawn_away_from_thief():
+    level = load_level(map_path("1.tmx"))
+    world = World(level)
+    for seed in range(20):
+        sim = Simulation(level, seed=seed, world=world, guards=2)
+        fields = [sim.master_fields.get(sim.thief_pos), sim.master_fields.get(sim.exit_pos)]
+
+        def away(pos):
+            return min(field.dist[pos[0], pos[1]] for field in fields)
+        # Bản đồ 1 rất nhỏ: nếu không ô nào đủ xa thì ông chủ phải ở các ô xa nhất có thể
+        farthest = sorted((away(cell) for cell in world.patrols.cells), reverse=True)
+        for guard in sim.guards:
+            assert all(type(v) is int for v in guard.pos)
+            assert away(guard.pos) >= min(SPAWN_MIN_DISTANCE, farthest[len(sim.guards) - 1])
+        result, ticks = sim.run()
+        assert not (result == CAUGHT and ticks <= 1)
+
+
+def test_vector_env_does_not_start_caught():
+    env = VectorEnv(load_level(map_path("1.tmx")), 16, seed=0)
+    _, _, done, info = env.step()
+    assert not (done & (info["result"] == RESULT_CODES[CAUGHT])).any()
+
+
+def test_seeds_give_different_games_on_map_5():
+    level = load_level(map_path("5.tmx"))
+    world = World(level)
+    games = set()
+    for seed in range(10):
+        sim = Simulation(level, seed=seed, world=world)
+        positions = []
+        while not sim.game_over:
+            sim.step()
+            positions.append(tuple(map(tuple, sim.master_positions)))
+        games.add((sim.result, tuple(positions)))
+    assert len(games) > 1
+    assert len({result for result, _ in games}) > 1
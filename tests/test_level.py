@@ -0,0 +1,67 @@
+import os
+import shutil
+
+import pytest
+
+from conftest import REPO
+from level import CACHE_DIR_NAME, load_level, parse_tmx
+
+
+# Bản sao của map/5.tmx cùng tileset nó tham chiếu (../furniture.tsx) trong thư mục tạm
+@pytest.fixture
+def tmx(tmp_path):
+    os.makedirs(tmp_path / "map")
+    shutil.copy(os.path.join(REPO, "map", "5.tmx"), tmp_path / "map" / "5.tmx")
+    shutil.copy(os.path.join(REPO, "furniture.tsx"), tmp_path / "furniture.tsx")
+    return tmp_path
+
+
+def _resolved(level):
+    return {gid: (os.path.abspath(image), width, height) for gid, (image, width, height) in level.tiles.items()}
+
+
+def _same(a, b):
+    assert a.to_payload()[:-1] == b.to_payload()[:-1]
+    assert _resolved(a) == _resolved(b)
+
+
+def test_cached_level_matches_parsed(tmx, monkeypatch):
+    monkeypatch.chdir(tmx)
+    parsed, _ = parse_tmx("map/5.tmx")
+    first = load_level("map/5.tmx")
+    assert os.path.exists(tmx / "map" / CACHE_DIR_NAME / "5.lvl")
+    second = load_level("map/5.tmx")
+    _same(parsed, first)
+    _same(parsed, second)
+
+
+def test_cache_loads_from_another_working_directory(tmx, tmp_path_factory, monkeypatch):
+    monkeypatch.chdir(tmx)
+    built = load_level("map/5.tmx")
+    tiles = _resolved(built)
+    monkeypatch.chdir(tmp_path_factory.mktemp("elsewhere"))
+    level = load_level(str(tmx / "map" / "5.tmx"))
+    assert level.to_payload()[:-1] == built.to_payload()[:-1]
+    assert _resolved(level) == tiles
+    assert os.path.dirname(next(iter(level.tiles.values()))[0]) == str(tmx / "tileset")
+
+
+def test_edited_tileset_invalidates_cache(tmx, monkeypatch):
+    monkeypatch.chdir(tmx)
+    level = load_level("map/5.tmx")
+    gid, (image, width, height) = next(iter(level.tiles.items()))
+    tsx = (tmx / "furniture.tsx").read_text(encoding="utf-8")
+    name = os.path.basename(image)
+    (tmx / "furniture.tsx").write_text(tsx.replace('"tileset/%s"' % name, '"renamed/%s"' % name), encoding="utf-8")
+    stat = os.stat(tmx / "map" / CACHE_DIR_NAME / "5.lvl")
+    os.utime(tmx / "furniture.tsx", ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert load_level("map/5.tmx").tiles[gid][0] == os.path.join("renamed", name)
+
+
+def test_corrupt_cache_is_rebuilt(tmx, monkeypatch):
+    monkeypatch.chdir(tmx)
+    level = load_level("map/5.tmx")
+    with open(tmx / "map" / CACHE_DIR_NAME / "5.lvl", "r+b") as f:
+        f.seek(40)
+        f.write(b"\xff" * 16)
+    _same(level, load_level("map/5.tmx"))
@@ -0,0 +1,131 @@
+import heapq
+import random
+from collections import deque
+
+import pytest
+
+from flowfield import FlowField, free_mask
+from pathfinding import IncrementalPlanner, build_neighbors
+from walkability import WalkGrid
+
+
+# Lưới ngẫu nhiên có tường bao quanh, tường rải rác và vài đồ nội thất (theo seed)
+def make_grid(rows, cols, seed, density=0.25):
+    rng = random.Random(seed)
+    grid = [[1 if r in (0, rows - 1) or c in (0, cols - 1) or rng.random() < density else 0
+             for c in range(cols)] for r in range(rows)]
+    furniture = [(rng.uniform(0, cols * 8), rng.uniform(0, rows * 8), 6, 6) for _ in range(rows * cols // 80)]
+    return WalkGrid(grid, furniture, 8, 8)
+
+
+def free_cells(walk_grid):
+    return [[r, c] for r in range(walk_grid.rows) for c in range(walk_grid.cols) if walk_grid.is_free(r, c)]
+
+
+# Khoảng cách tham chiếu (BFS) từ goal tới mọi ô, bỏ qua các ô trong blocked
+def bfs(walk_grid, goal, blocked=()):
+    neighbors = build_neighbors(walk_grid)
+    cols = walk_grid.cols
+    blocked = {r * cols + c for r, c in blocked}
+    start = goal[0] * cols + goal[1]
+    dist = {start: 0}
+    queue = deque([start])
+    while queue:
+        i = queue.popleft()
+        for j in neighbors[i]:
+            if j not in dist and j not in blocked:
+                dist[j] = dist[i] + 1
+                queue.append(j)
+    return dist
+
+
+def assert_valid(walk_grid, path, start, goal, blocked=()):
+    assert path[0] == list(start) and path[-1] == list(goal)
+    for a, b in zip(path, path[1:]):
+        assert abs(a[0] - b[0]) + abs(a[1] - b[1]) == 1
+    assert all(walk_grid.is_free(r, c) and [r, c] not in blocked for r, c in path)
+
+
+@pytest.fixture(params=[(12, 20, 0), (24, 24, 1), (40, 30, 2)], ids=lambda p: "%dx%d-seed%d" % p)
+def case(request):
+    rows, cols, seed = request.param
+    walk_grid = make_grid(rows, cols, seed)
+    rng = random.Random(seed)
+    cells = free_cells(walk_grid)
+    return walk_grid, [(rng.choice(cells), rng.choice(cells)) for _ in range(40)]
+
+
+def test_flow_field_matches_bfs(case):
+    walk_grid, pairs = case
+    free = free_mask(walk_grid)
+    for start, goal in pairs[:10]:
+        field = FlowField(free, goal)
+        reference = bfs(walk_grid, goal)
+        for r, c in free_cells(walk_grid):
+            assert field.distance([r, c]) == reference.get(r * walk_grid.cols + c)
+        path = field.path(start)
+        if start[0] * walk_grid.cols + start[1] in reference:
+            assert_valid(walk_grid, path, start, goal)
+
+
+def test_incremental_planner_around_moving_obstacles(case):
+    walk_grid, pairs = case
+    rng = random.Random(len(pairs))
+    cells = free_cells(walk_grid)
+    planner = IncrementalPlanner(walk_grid)
+    for start, goal in pairs[:10]:
+        pos = start
+        for _ in range(30):
+            obstacles = [cell for cell in rng.sample(cells, 3) if cell not in (pos, goal)]
+            dist = bfs(walk_grid, goal, obstacles).get(pos[0] * walk_grid.cols + pos[1])
+            path = planner.plan(pos, goal, obstacles)
+            if dist is None:
+                assert path is None
+                break
+            assert_valid(walk_grid, path, pos, goal, obstacles)
+            assert len(path) - 1 == dist
+            if len(path) == 1:
+                break
+            pos = path[1]
+
+
+# Dijkstra tham chiếu với chi phí của bước u -> v là cost[v]
+def dijkstra(neighbors, cost, goal):
+    dist = {goal: 0}
+    heap = [(0, goal)]
+    while heap:
+        d, v = heapq.heappop(heap)
+        if d > dist[v]:
+            continue
+        for u in neighbors[v]:
+            nd = d + cost[v]
+            if nd < dist.get(u, float("inf")):
+                dist[u] = nd
+                heapq.heappush(heap, (nd, u))
+    return dist
+
+
+def test_weighted_planner_follows_cheapest_path(case):
+    walk_grid, pairs = case
+    neighbors = build_neighbors(walk_grid)
+    rng = random.Random(7)
+    cols = walk_grid.cols
+    cost = [1] * (walk_grid.rows * cols)
+    planner = IncrementalPlanner(walk_grid, neighbors, cost)
+    for start, goal in pairs[:8]:
+        pos, goal_id = start, goal[0] * cols + goal[1]
+        for _ in range(25):
+            changed = rng.sample(range(len(cost)), 20)
+            for cell in changed:
+                cost[cell] = rng.choice((1, 1, 5, 33))
+            planner.update_costs(changed)
+            reference = dijkstra(neighbors, cost, goal_id)
+            step = planner.next_step(pos, goal)
+            i = pos[0] * cols + pos[1]
+            if i == goal_id or i not in reference:
+                assert step is None
+                break
+            j = step[0] * cols + step[1]
+            assert j in neighbors[i]
+            assert cost[j] + reference[j] == reference[i]
+            pos = step
@@ -0,0 +1,52 @@
+import pytest
+
+from conftest import map_path
+from level import load_level
+from replay import Replay, ReplayPlayer, record_episode, verify
+from simulation import Simulation, World
+
+MAP = map_path("5.tmx")
+
+
+@pytest.fixture(scope="module")
+def world():
+    return World(load_level(MAP))
+
+
+@pytest.mark.parametrize("params", [{}, {"predictive": "minimax"}, {"predictive": "expectimax"},
+                                    {"risk_aware": True}, {"guards": 4}])
+def test_round_trip_and_verify(world, params):
+    replay = record_episode(world.level, 7, world=world, keyframe_interval=16, **params)
+    loaded = Replay.from_bytes(replay.to_bytes())
+    assert (loaded.seed, loaded.ticks, loaded.result) == (replay.seed, replay.ticks, replay.result)
+    assert loaded.params == replay.params
+    assert bytes(loaded.codes[:replay.ticks * replay.agents]) == bytes(replay.codes[:replay.ticks * replay.agents])
+    assert verify(loaded, world.level) is None
+
+
+def test_seek_matches_sequential_playback(world):
+    replay = Replay.from_bytes(record_episode(world.level, 3, world=world, keyframe_interval=8, guards=3).to_bytes())
+    player = ReplayPlayer(replay)
+    states = [player.state.copy()]
+    while player.step() is not None:
+        states.append(player.state.copy())
+    assert len(states) == replay.ticks + 1
+    seeker = ReplayPlayer(replay)
+    for tick in (replay.ticks, 0, replay.ticks // 2, 9, 8, 1):
+        assert seeker.seek(tick) == states[tick]
+
+
+def test_rejects_other_files():
+    with pytest.raises(ValueError):
+        Replay.from_bytes(b"not a replay" + bytes(64))
+
+
+# Bản đồ 1 không có lối ra: lối ra ngẫu nhiên của ván phải được lưu trong replay
+def test_random_exit_is_recorded():
+    level = load_level(map_path("1.tmx"))
+    assert level.exit_pos is None
+    for seed in range(3):
+        replay = record_episode(level, seed)
+        loaded = Replay.from_bytes(replay.to_bytes())
+        assert loaded.exit_pos == tuple(Simulation(level, seed=seed).exit_pos)
+        assert verify(loaded, level) is None
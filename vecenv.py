@@ -0,0 +1,333 @@
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from flowfield import UNREACHABLE, FlowField, distance_field, free_mask
+from level import load_level
+from replay import MOVES, RESULT_CODES
+from simulation import CAUGHT, ESCAPED, MASTER_VISION_RANGE, MAX_TICKS, THIEF_VISION_RANGE, TIMEOUT, Simulation, World
+from vision import diamond_stencil
+
+# Số điểm tuần tra (mỗi điểm một trường hướng đi tính sẵn) các ông chủ chọn ngẫu nhiên
+PATROL_POOL_SIZE = 32
+
+# Bán kính (Manhattan) của bảng đuổi bắt cục bộ, tính thêm so với tầm nhìn ông chủ
+CHASE_MARGIN = 2
+
+# Mã hành động = mã hướng của replay: 0 đứng yên, 1-4 lên/xuống/trái/phải
+STAY, UP, DOWN, LEFT, RIGHT = range(5)
+
+# Hướng xuống dốc của FlowField (chỉ số trong walkability.DIRECTIONS, -1 = đứng yên) -> mã hành động
+DESCENT_ACTIONS = np.array([RIGHT, DOWN, LEFT, UP, STAY], dtype=np.int8)
+
+# Phần thưởng cho nhân vật trộm
+ITEM_REWARD = 1.0
+ESCAPE_REWARD = 1.0
+CAUGHT_REWARD = -1.0
+
+
+# Bảng di chuyển: moves[ô, hành động] = ô sau khi đi (giữ nguyên nếu ô đích bị chặn/ngoài bản đồ)
+def move_table(free):
+    rows, cols = free.shape
+    cells = np.arange(rows * cols, dtype=np.int32)
+    r, c = np.divmod(cells, cols)
+    moves = np.empty((rows * cols, len(MOVES)), dtype=np.int32)
+    for action, (dr, dc) in enumerate(MOVES):
+        nr, nc = r + dr, c + dc
+        inside = (nr >= 0) & (nr < rows) & (nc >= 0) & (nc < cols)
+        target = np.where(inside, nr * cols + nc, cells)
+        moves[:, action] = np.where(inside & free.reshape(-1)[target], target, cells)
+    return moves
+
+
+# Mảng shape (len(offsets), rows, cols): values dịch theo từng độ lệch, ngoài bản đồ = fill
+def _shifted(values, offsets, radius, fill):
+    rows, cols = values.shape[-2:]
+    padded = np.full(values.shape[:-2] + (rows + 2 * radius, cols + 2 * radius), fill, dtype=values.dtype)
+    padded[..., radius:radius + rows, radius:radius + cols] = values
+    return np.stack([padded[..., radius + dr:radius + dr + rows, radius + dc:radius + dc + cols]
+                     for dr, dc in offsets])
+
+
+# Bảng đuổi bắt cục bộ: với mỗi ô nguồn và mỗi độ lệch k trong hình thoi bán kính radius,
+# hành động đầu tiên trên đường ngắn nhất (chỉ đi trong hình thoi) tới ô nguồn + offsets[k].
+# BFS chạy đồng thời cho mọi ô nguồn bằng phép dịch mảng; trả về (offsets, actions[k, hàng, cột])
+def chase_table(free, radius):
+    rows, cols = free.shape
+    offsets = diamond_stencil(radius)
+    index = {offset: k for k, offset in enumerate(offsets)}
+    open_cells = _shifted(free, offsets, radius, False)  # open_cells[k] = ô nguồn + offsets[k] trống
+    unknown = np.uint8(255)
+    dist = np.full((len(offsets), rows, cols), unknown, dtype=np.uint8)
+    dist[index[(0, 0)]][free] = 0
+    # Các độ lệch kề (trong hình thoi) của mỗi độ lệch
+    links = [[index[(dr - mr, dc - mc)] for mr, mc in MOVES[1:] if (dr - mr, dc - mc) in index]
+             for dr, dc in offsets]
+    for d in range(1, min(len(offsets), 254)):
+        frontier = dist == d - 1
+        changed = False
+        for k in range(len(offsets)):
+            reached = np.zeros((rows, cols), dtype=bool)
+            for j in links[k]:
+                reached |= frontier[j]
+            reached &= open_cells[k] & (dist[k] == unknown)
+            if reached.any():
+                dist[k][reached] = d
+                changed = True
+        if not changed:
+            break
+
+    # Khoảng cách từ ô kề (theo hành động) tới đích, chọn hành động nhỏ nhất
+    neighbor_dist = _shifted(dist, [move for move in MOVES[1:]], 1, unknown)  # [hành động - 1, k, hàng, cột]
+    actions = np.zeros((len(offsets), rows, cols), dtype=np.int8)
+    for k, (dr, dc) in enumerate(offsets):
+        if (dr, dc) == (0, 0):
+            continue
+        candidates = np.full((4, rows, cols), unknown, dtype=np.uint8)
+        for a, (mr, mc) in enumerate(MOVES[1:]):
+            j = index.get((dr - mr, dc - mc))
+            if j is not None:
+                candidates[a] = neighbor_dist[a, j]
+        best = candidates.argmin(axis=0)
+        reachable = candidates.min(axis=0) != unknown
+        actions[k] = np.where(reachable, best + 1, STAY)
+    return offsets, actions
+
+
+# Môi trường vector hoá: num_envs ván chơi trên cùng một bản đồ chạy song song, toàn bộ trạng
+# thái là mảng NumPy (vị trí theo id ô = hàng * số cột + cột). Mỗi lần step() di chuyển mọi
+# ván bằng vài phép tra bảng trên cả lô: di chuyển qua bảng ô kề đi được, tầm nhìn ông chủ
+# (giống master_vision) qua bảng line of sight tính sẵn, đuổi bắt qua bảng BFS cục bộ và
+# tuần tra qua các trường hướng đi tới một tập điểm tuần tra cố định.
+#
+# Giao diện kiểu gym: reset() -> obs, step(actions) -> (obs, reward, done, info), ván kết
+# thúc được tự động đặt lại. actions=None dùng AI có sẵn của nhân vật trộm (đi theo lộ trình
+# nhặt vật phẩm tối ưu). AI ông chủ là bản xấp xỉ của Simulation (đi xuống dốc trường khoảng
+# cách thay cho cooperative A*), nên kết quả giống về thống kê chứ không trùng từng bước.
+class VectorEnv:
+    def __init__(self, level, num_envs, seed=None, guards=None, thief_vision_range=THIEF_VISION_RANGE,
+                 master_vision_range=MASTER_VISION_RANGE, max_ticks=MAX_TICKS, world=None,
+                 patrol_pool_size=PATROL_POOL_SIZE):
+        self.level = level
+        self.num_envs = num_envs
+        self.max_ticks = max_ticks
+        self.master_vision_range = master_vision_range
+        self.rng = np.random.default_rng(seed)
+        self.world = world = world or World(level, thief_vision_range, master_vision_range)
+        self.rows, self.cols = rows, cols = level.rows, level.cols
+
+        # Vị trí xuất phát, vật phẩm và lối ra giống hệt một ván Simulation (kể cả khi bản đồ thiếu)
+        template = Simulation(level, seed=seed, world=world, guards=guards, thief_vision_range=thief_vision_range,
+                              master_vision_range=master_vision_range)
+        self.start_thief = template.thief_pos[0] * cols + template.thief_pos[1]
+        self.start_guards = np.array([r * cols + c for r, c in template.master_positions], dtype=np.int32)
+        self.num_guards = len(self.start_guards)
+        self.item_cells = np.array([r * cols + c for r, c in template.items], dtype=np.int32)
+        self.exit_cell = template.exit_pos[0] * cols + template.exit_pos[1]
+
+        thief_free = free_mask(world.thief_walk_grid)
+        master_free = free_mask(world.master_walk_grid)
+        self.thief_moves = move_table(thief_free)
+        self.master_moves = move_table(master_free)
+
+        # AI trộm: hướng đi tới từng vật phẩm/lối ra, thứ tự nhặt theo lộ trình tối ưu từ điểm xuất phát
+        goals = [list(divmod(int(cell), cols)) for cell in self.item_cells] + [template.exit_pos]
+        fields = [world.thief_fields.get(goal) for goal in goals]
+        self.goal_actions = np.stack([DESCENT_ACTIONS[field.direction.reshape(-1)] for field in fields])
+        route = world.route_planner.plan(template.thief_pos, template.items, template.exit_pos)
+        self.route = np.array([template.items.index(item) for item in route], dtype=np.int32)
+
+        # Tầm nhìn ông chủ: sight[k, ô] = ông chủ tại ô thấy ô + offsets[k] (trong tầm và không bị tường chặn)
+        radius = master_vision_range + CHASE_MARGIN
+        self.radius = radius
+        self.offsets, self.chase_actions = chase_table(master_free, radius)
+        self.chase_actions = self.chase_actions.reshape(len(self.offsets), -1)
+        self.offset_index = np.full((2 * radius + 1, 2 * radius + 1), -1, dtype=np.int32)
+        for k, (dr, dc) in enumerate(self.offsets):
+            self.offset_index[dr + radius, dc + radius] = k
+        vision = world.vision
+        self.sight = np.zeros((len(self.offsets), rows * cols), dtype=bool)
+        visible_offsets = [(k, vision.bit[offset]) for k, offset in enumerate(self.offsets)
+                           if abs(offset[0]) + abs(offset[1]) <= master_vision_range]
+        for cell in np.flatnonzero(master_free):
+            mask = vision.line_of_sight_mask(divmod(int(cell), cols))
+            for k, bit in visible_offsets:
+                if mask >> bit & 1:
+                    self.sight[k, cell] = True
+
+        # Tuần tra: tập điểm tuần tra ngẫu nhiên trong vùng ông chủ đi tới được từ điểm xuất phát
+        reach = distance_field(master_free, divmod(int(self.start_guards[0]), cols)).reshape(-1) != UNREACHABLE
+        candidates = np.flatnonzero(reach)
+        pool = self.rng.choice(candidates, size=min(patrol_pool_size, len(candidates)), replace=False)
+        self.patrol_cells = pool.astype(np.int32)
+        self.patrol_actions = np.stack([DESCENT_ACTIONS[FlowField(master_free, divmod(int(cell), cols)).direction.reshape(-1)]
+                                        for cell in pool])
+
+        n, g = num_envs, self.num_guards
+        self.thief = np.empty(n, dtype=np.int32)
+        self.thief_direction = np.empty(n, dtype=np.int8)
+        self.guards = np.empty((n, g), dtype=np.int32)
+        self.waypoints = np.empty((n, g), dtype=np.int32)  # Chỉ số trong patrol_cells
+        self.targets = np.empty((n, g), dtype=np.int32)  # Ô đuổi theo (vị trí cuối cùng thấy trộm), -1 = tuần tra
+        self.items = np.empty((n, len(self.item_cells)), dtype=bool)  # Vật phẩm còn lại
+        self.ticks = np.empty(n, dtype=np.int32)
+        self.seen = np.zeros(n, dtype=bool)
+        self.reset()
+
+    # Đặt lại các ván trong mask (mặc định: mọi ván); trả về quan sát
+    def reset(self, mask=None):
+        mask = np.ones(self.num_envs, dtype=bool) if mask is None else mask
+        count = int(mask.sum())
+        self.thief[mask] = self.start_thief
+        self.thief_direction[mask] = RIGHT
+        self.guards[mask] = self.start_guards
+        self.waypoints[mask] = self.rng.integers(len(self.patrol_cells), size=(count, self.num_guards))
+        self.targets[mask] = -1
+        self.items[mask] = True
+        self.ticks[mask] = 0
+        self.seen[mask] = False
+        return self.observe()
+
+    # Quan sát của mọi ván (toạ độ hàng, cột)
+    def observe(self):
+        cols = self.cols
+        return {
+            "thief": np.stack(np.divmod(self.thief, cols), axis=-1),
+            "thief_direction": self.thief_direction.copy(),
+            "guards": np.stack(np.divmod(self.guards, cols), axis=-1),
+            "chasing": self.targets >= 0,
+            "items": self.items.copy(),
+            "seen": self.seen.copy(),
+            "tick": self.ticks.copy(),
+        }
+
+    # Ông chủ tại ô guards có nhìn thấy trộm tại ô thief không (giống master_vision, cho cả lô);
+    # trả về (thấy, chỉ số độ lệch trong bảng cục bộ hoặc -1)
+    def guards_seeing(self, guards, thief):
+        cols, radius = self.cols, self.radius
+        gr, gc = np.divmod(guards, cols)
+        tr, tc = np.divmod(thief, cols)
+        dr, dc = tr - gr, tc - gc
+        inside = (np.abs(dr) <= radius) & (np.abs(dc) <= radius)
+        k = np.where(inside, self.offset_index[np.clip(dr + radius, 0, 2 * radius),
+                                               np.clip(dc + radius, 0, 2 * radius)], -1)
+        sees = (k >= 0) & self.sight[np.maximum(k, 0), guards]
+        return sees, k
+
+    # Hành động mặc định của nhân vật trộm: tới vật phẩm còn lại đầu tiên theo lộ trình, hết thì tới lối ra
+    def thief_policy(self):
+        remaining = self.items[:, self.route]
+        has_item = remaining.any(axis=1)
+        goal = np.where(has_item, self.route[remaining.argmax(axis=1)], len(self.item_cells))
+        return self.goal_actions[goal, self.thief]
+
+    def _move_guards(self, active):
+        rows = np.flatnonzero(active)
+        guards = self.guards[rows]
+        targets = self.targets[rows]
+        waypoints = self.waypoints[rows]
+        thief = self.thief[rows]
+        seen = np.zeros(len(rows), dtype=bool)
+        for g in range(self.num_guards):
+            pos = guards[:, g]
+            sees, _ = self.guards_seeing(pos, thief)
+            seen |= sees
+            targets[sees, g] = thief[sees]
+
+            # Đuổi theo: hành động tra bảng cục bộ; mất dấu (không tới được) hoặc tới nơi thì tuần tra tiếp
+            chasing = targets[:, g] >= 0
+            _, k = self.guards_seeing(pos, np.where(chasing, targets[:, g], pos))
+            chase = self.chase_actions[np.maximum(k, 0), pos]
+            lost = chasing & ((k < 0) | (chase == STAY))
+            targets[lost, g] = -1
+            chasing &= ~lost
+
+            # Tuần tra: tới điểm tuần tra thì chọn điểm khác
+            patrol = self.patrol_actions[waypoints[:, g], pos]
+            arrived = ~chasing & (patrol == STAY)
+            if arrived.any():
+                waypoints[arrived, g] = self.rng.integers(len(self.patrol_cells), size=int(arrived.sum()))
+                patrol[arrived] = self.patrol_actions[waypoints[arrived, g], pos[arrived]]
+
+            action = np.where(chasing, chase, patrol)
+            new = self.master_moves[pos, action]
+            # Không đi vào ô của ông chủ khác
+            blocked = (guards == new[:, None]).any(axis=1) & (new != pos)
+            guards[:, g] = np.where(blocked, pos, new)
+        self.guards[rows] = guards
+        self.targets[rows] = targets
+        self.waypoints[rows] = waypoints
+        self.seen[rows] = seen
+
+    # Chạy một bước cho mọi ván; actions: mã hành động của trộm cho từng ván (None = AI có sẵn).
+    # Trả về (quan sát, phần thưởng, kết thúc, info) với info["result"] là mã kết quả (RESULT_CODES)
+    # và info["ticks"] là số bước của các ván vừa kết thúc (các ván đó đã được đặt lại)
+    def step(self, actions=None):
+        actions = self.thief_policy() if actions is None else np.asarray(actions, dtype=np.int8)
+        self.ticks += 1
+        reward = np.zeros(self.num_envs, dtype=np.float32)
+
+        # Di chuyển nhân vật trộm và nhặt vật phẩm
+        new = self.thief_moves[self.thief, actions]
+        moved = new != self.thief
+        self.thief_direction[moved] = actions[moved]
+        self.thief = new
+        picked = (self.item_cells[None, :] == new[:, None]) & self.items
+        self.items &= ~picked
+        reward += picked.sum(axis=1) * ITEM_REWARD
+        escaped = (new == self.exit_cell) & ~self.items.any(axis=1)
+
+        # Di chuyển các ông chủ (trừ các ván trộm vừa thoát hoặc vừa đi vào ô của ông chủ: ông
+        # chủ đó đứng yên như khi tới đích trong Simulation), rồi kiểm tra bắt được
+        caught = ~escaped & (self.guards == new[:, None]).any(axis=1)
+        self._move_guards(~escaped & ~caught)
+        caught |= ~escaped & (self.guards == new[:, None]).any(axis=1)
+        timeout = ~escaped & ~caught & (self.ticks >= self.max_ticks)
+        reward += escaped * ESCAPE_REWARD + caught * CAUGHT_REWARD
+
+        result = np.zeros(self.num_envs, dtype=np.int8)
+        result[escaped] = RESULT_CODES[ESCAPED]
+        result[caught] = RESULT_CODES[CAUGHT]
+        result[timeout] = RESULT_CODES[TIMEOUT]
+        done = result != 0
+        info = {"result": result, "ticks": np.where(done, self.ticks, 0)}
+        if done.any():
+            self.reset(done)
+        return self.observe(), reward, done, info
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Chạy nhiều ván song song bằng môi trường vector hoá (NumPy)")
+    parser.add_argument("map", help="file .tmx")
+    parser.add_argument("-n", "--envs", type=int, default=4096, help="số ván chạy song song")
+    parser.add_argument("--steps", type=int, default=1000, help="số bước của cả lô")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--guards", type=int, default=None, help="số ông chủ (mặc định: theo bản đồ)")
+    parser.add_argument("--max-ticks", type=int, default=MAX_TICKS)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    env = VectorEnv(load_level(args.map), args.envs, seed=args.seed, guards=args.guards, max_ticks=args.max_ticks)
+    print(f"built in {time.perf_counter() - start:.2f}s")
+    counts = {code: 0 for code in RESULT_CODES.values() if code}
+    lengths = []
+    start = time.perf_counter()
+    for _ in range(args.steps):
+        _, _, done, info = env.step()
+        for code in counts:
+            counts[code] += int((info["result"] == code).sum())
+        lengths.extend(info["ticks"][done].tolist())
+    elapsed = time.perf_counter() - start
+    total = sum(counts.values())
+    names = {code: result for result, code in RESULT_CODES.items()}
+    print(f"{args.envs * args.steps} env steps in {elapsed:.2f}s ({args.envs * args.steps / elapsed:,.0f} steps/s)")
+    if total:
+        print(f"{total} episodes: " + ", ".join(f"{names[code]} {count / total:.1%}" for code, count in counts.items()) +
+              f", mean steps {sum(lengths) / total:.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
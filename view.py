@@ -0,0 +1,155 @@
+import pygame
+
+from assets import AssetManager
+from instrumentation import Profiler
+from renderer import MapRenderer
+from simulation import MASTER_SCALE_FACTOR, THIEF_SCALE_FACTOR
+
+# Màu sắc
+WHITE = (255, 255, 255)  # Sàn/lối ra
+BLACK = (0, 0, 0)  # Tường
+RED = (255, 0, 0)  # Nhân vật trộm (dùng làm mặc định nếu lỗi)
+GREEN = (0, 255, 0)  # Vật phẩm
+BLUE = (0, 0, 255)  # Ông chủ
+GRAY = (128, 128, 128)  # Màu nền
+LIGHT_BLUE = (135, 206, 250)  # Viền của vùng tầm nhìn nhân vật trộm
+LIGHT_PURPLE = (147, 112, 219)  # Viền của vùng tầm nhìn ông chủ
+YELLOW = (255, 255, 0)  # Màu viền cho các đối tượng nội thất
+
+# Sprite sheet của nhân vật trộm
+THIEF_SHEET = "Player.png"
+SPRITE_ROWS = 4  # Số hàng trong sprite sheet
+SPRITE_COLS = 4  # Số cột trong sprite sheet
+
+# Mỗi cột của sprite sheet là một hướng: xuống, lên, trái, phải; mỗi hàng là một khung hình
+SPRITE_DIRECTIONS = ["down", "up", "left", "right"]
+
+# Cỡ chữ của dòng trạng thái và bảng thời gian khung hình, theo chiều cao khung hình 800
+STATUS_FONT_SIZE = 30
+OVERLAY_FONT_SIZE = 22
+REFERENCE_HEIGHT = 800
+
+
+# Tải sprite sheet của nhân vật trộm (convert_alpha khi đã có cửa sổ); lỗi thì dùng hình vuông màu đỏ
+def load_thief_sheet(path=THIEF_SHEET):
+    try:
+        sheet = pygame.image.load(path)
+        return sheet.convert_alpha() if pygame.display.get_surface() else sheet
+    except (pygame.error, FileNotFoundError) as e:
+        print(f"Error loading thief sprite sheet: {e}")
+        sheet = pygame.Surface((128, 128))
+        sheet.fill(RED)
+        return sheet
+
+
+# Cách vẽ một màn chơi ở kích thước screen_size bất kỳ: tỉ lệ/vị trí vẽ, sprite và nền đã ghép
+# sẵn (MapRenderer). draw() vẽ một khung hình (bản đồ, vùng tầm nhìn, nhân vật, dòng trạng thái)
+# lên surface bất kỳ: cửa sổ game (main.py) hoặc surface ngoài màn hình (headless.py).
+class GameView:
+    def __init__(self, level, vision, screen_size, thief_sheet=None, profiler=None):
+        self.level = level
+        self.vision = vision
+        self.screen_size = screen_size
+        self.profiler = profiler or Profiler()
+        width, height = screen_size
+        grid_size = level.tile_width  # Kích thước ô (giả sử tilewidth = tileheight)
+
+        # Tính toán kích thước bản đồ gốc (pixel)
+        map_width = level.cols * grid_size
+        map_height = level.rows * grid_size
+
+        # Tính hệ số phóng to để bản đồ lấp đầy khung hình, rồi căn giữa bản đồ
+        self.scale_factor = min(width / map_width, height / map_height)
+        self.cell = grid_size * self.scale_factor  # Kích thước ô sau khi phóng to
+        self.offset_x = (width - map_width * self.scale_factor) // 2
+        self.offset_y = (height - map_height * self.scale_factor) // 2
+
+        # Ảnh của bản đồ (atlas tile) và sprite sheet, biến thể đã phóng to được cache
+        self.assets = AssetManager(level)
+        self.assets.add_sheet(THIEF_SHEET, thief_sheet if thief_sheet is not None else load_thief_sheet())
+
+        # Kích thước hitbox của nhân vật
+        thief_size = max(int(self.cell * THIEF_SCALE_FACTOR), 1)
+        master_size = max(int(self.cell * MASTER_SCALE_FACTOR), 1)
+        self.thief_sprites = {
+            direction: [self.assets.sprite(THIEF_SHEET, row, col, SPRITE_ROWS, SPRITE_COLS, (thief_size, thief_size))
+                        for row in range(SPRITE_ROWS)]
+            for col, direction in enumerate(SPRITE_DIRECTIONS)
+        }
+
+        # Sprite đơn giản (phóng to theo scale_factor) cho các đối tượng khác
+        cell = max(int(self.cell), 1)
+        self.master_img = pygame.Surface((master_size, master_size))
+        self.master_img.fill(BLUE)
+        self.item_img = pygame.Surface((cell, cell))
+        self.item_img.fill(GREEN)
+        self.exit_img = pygame.Surface((cell, cell))
+        self.exit_img.fill(WHITE)
+
+        # Font để hiển thị debug (co theo chiều cao khung hình)
+        font_scale = height / REFERENCE_HEIGHT
+        self.font = pygame.font.SysFont(None, max(int(STATUS_FONT_SIZE * font_scale), 8))
+        self.overlay_font = pygame.font.SysFont(None, max(int(OVERLAY_FONT_SIZE * font_scale), 8))
+        self.overlay_top = int(40 * font_scale)
+        self.line_height = max(int(18 * font_scale), 8)
+
+        # Ghép sẵn các layer tĩnh và đồ nội thất vào một surface nền đã phóng to
+        self.renderer = MapRenderer(level, screen_size, self.scale_factor, (self.offset_x, self.offset_y),
+                                    GRAY, self.assets)
+
+    # Vị trí (pixel) nội suy giữa vị trí ô trước và sau bước logic, alpha trong [0, 1]
+    def lerp_position(self, prev, cur, alpha):
+        row = prev[0] + (cur[0] - prev[0]) * alpha
+        col = prev[1] + (cur[1] - prev[1]) * alpha
+        return (round(col * self.cell + self.offset_x), round(row * self.cell + self.offset_y))
+
+    # Vị trí (pixel) góc trên-trái của một ô
+    def cell_position(self, pos):
+        return (pos[1] * self.cell + self.offset_x, pos[0] * self.cell + self.offset_y)
+
+    # Vẽ một khung hình lên surface: nhân vật nội suy từ vị trí trước (prev_*) tới vị trí hiện tại
+    # theo alpha; chasing=None thì tính từ tầm nhìn; overlay: các dòng của bảng thời gian khung hình.
+    # Chỉ vẽ, không cập nhật cửa sổ (xem MapRenderer.end_frame)
+    def draw(self, surface, thief_pos, thief_direction, guards, items, exit_pos, prev_thief_pos=None,
+             prev_guards=None, alpha=1.0, chasing=None, overlay=None, frame=0):
+        profiler, renderer = self.profiler, self.renderer
+        prev_thief_pos = prev_thief_pos or thief_pos
+        prev_guards = prev_guards or guards
+
+        # Vẽ game: xóa các vùng đã thay đổi bằng nền tĩnh đã ghép sẵn
+        with profiler.timer("draw_map"):
+            renderer.begin_frame(surface)
+
+        with profiler.timer("vision_zones"):
+            # Vẽ zone tầm nhìn của nhân vật trộm (chỉ vẽ viền)
+            renderer.draw_cell_outlines(surface, LIGHT_BLUE, self.vision.thief_zone(thief_pos, thief_direction))
+
+            # Vẽ zone tầm nhìn của các ông chủ (chỉ vẽ viền)
+            master_zone = frozenset().union(*(self.vision.master_zone(pos) for pos in guards))
+            renderer.draw_cell_outlines(surface, LIGHT_PURPLE, master_zone)
+
+        # Vẽ nhân vật trộm với sprite tương ứng với hướng
+        thief_img = self.thief_sprites[thief_direction][frame]  # Chọn sprite theo hướng
+        renderer.blit(surface, thief_img, self.lerp_position(prev_thief_pos, thief_pos, alpha))
+
+        # Vẽ các đối tượng khác
+        for prev, pos in zip(prev_guards, guards):
+            renderer.blit(surface, self.master_img, self.lerp_position(prev, pos, alpha))
+        for item in items:
+            renderer.blit(surface, self.item_img, self.cell_position(item))
+        if exit_pos is not None:
+            renderer.blit(surface, self.exit_img, self.cell_position(exit_pos))
+
+        # Hiển thị trạng thái debug
+        if chasing is None:
+            chasing = any(self.vision.master_sees(pos, thief_pos) for pos in guards)
+        mode = "Đuổi theo" if chasing else "Tuần tra"
+        master_pos = list(guards[0]) if guards else None
+        master_status = f"Ông chủ: {master_pos} ({len(guards)}), Chế độ: {mode}, Hướng trộm: {thief_direction}"
+        renderer.blit(surface, self.font.render(master_status, True, BLACK), (10, 10))
+
+        # Bảng thời gian khung hình (trung bình các khung hình gần nhất)
+        if overlay:
+            for i, line in enumerate(overlay):
+                renderer.blit(surface, self.overlay_font.render(line, True, BLACK),
+                              (10, self.overlay_top + i * self.line_height))
@@ -0,0 +1,162 @@
+from collections import OrderedDict
+
+# Tầm nhìn mặc định
+THIEF_VISION_RANGE = 2
+MASTER_VISION_RANGE = 3
+
+# Số zone tối đa giữ trong cache (vị trí, hướng) -> zone
+ZONE_CACHE_SIZE = 4096
+
+# 4 góc phần tư của shadowcasting: (depth, col) -> (dr, dc)
+QUADRANTS = [
+    lambda depth, col: (-depth, col),  # Bắc
+    lambda depth, col: (depth, col),   # Nam
+    lambda depth, col: (col, depth),   # Đông
+    lambda depth, col: (col, -depth),  # Tây
+]
+
+
+# Stencil hình thoi (khoảng cách Manhattan <= vision_range), dùng cho ông chủ
+def diamond_stencil(vision_range):
+    return [(dr, dc)
+            for dr in range(-vision_range, vision_range + 1)
+            for dc in range(-vision_range, vision_range + 1)
+            if abs(dr) + abs(dc) <= vision_range]
+
+
+# Stencil của nhân vật trộm: các ô kề + hình nón theo hướng nhìn
+def cone_stencil(vision_range, direction):
+    offsets = {(0, 0), (-1, 0), (1, 0), (0, -1), (0, 1)}
+    for d in range(vision_range + 1):
+        width = vision_range - d
+        for w in range(-width, width + 1):
+            if direction == "up":
+                offsets.add((-d, w))
+            elif direction == "down":
+                offsets.add((d, w))
+            elif direction == "left":
+                offsets.add((w, -d))
+            elif direction == "right":
+                offsets.add((w, d))
+    return sorted(offsets)
+
+
+# Symmetric shadowcasting (A thấy B khi và chỉ khi B thấy A), giới hạn trong bán kính
+# radius; trả về tập độ lệch (dr, dc) nhìn thấy được từ origin.
+# Hệ số góc lưu dạng phân số nguyên (tử, mẫu) với mẫu > 0 để tránh Fraction.
+def shadowcast(is_wall, origin, radius):
+    row0, col0 = origin
+    visible = {(0, 0)}
+    for transform in QUADRANTS:
+        rows = [(1, -1, 1, 1, 1)]  # (depth, tử start, mẫu start, tử end, mẫu end)
+        while rows:
+            depth, sn, sd, en, ed = rows.pop()
+            if depth > radius:
+                continue
+            prev_wall = None
+            # Cột đầu: làm tròn depth*start lên khi bằng .5; cột cuối: làm tròn depth*end xuống
+            first = (2 * depth * sn + sd) // (2 * sd)
+            last = -((ed - 2 * depth * en) // (2 * ed))
+            for col in range(first, last + 1):
+                dr, dc = transform(depth, col)
+                wall = is_wall(row0 + dr, col0 + dc)
+                if wall or (depth * sn <= col * sd and col * ed <= depth * en):
+                    visible.add((dr, dc))
+                if prev_wall and not wall:
+                    sn, sd = 2 * col - 1, 2 * depth
+                if prev_wall is False and wall:
+                    rows.append((depth + 1, sn, sd, 2 * col - 1, 2 * depth))
+                prev_wall = wall
+            if prev_wall is False:
+                rows.append((depth + 1, sn, sd, en, ed))
+    return visible
+
+
+# Hệ thống tầm nhìn: stencil độ lệch tính sẵn cho từng tầm nhìn/hướng, tầm nhìn thật
+# (bị tường chặn) của mỗi ô tính một lần bằng shadowcasting và lưu thành bitmask
+# theo stencil, zone được cache theo (vị trí, hướng)
+class VisionSystem:
+    def __init__(self, map_grid, thief_vision_range=THIEF_VISION_RANGE,
+                 master_vision_range=MASTER_VISION_RANGE):
+        self.map_grid = map_grid
+        self.rows = len(map_grid)
+        self.cols = len(map_grid[0]) if map_grid else 0
+        self.thief_vision_range = thief_vision_range
+        self.master_vision_range = master_vision_range
+
+        # Stencil chung (hình thoi bán kính lớn nhất) dùng để đánh số bit
+        self.radius = max(thief_vision_range, master_vision_range, 1)
+        self.stencil = diamond_stencil(self.radius)
+        self.bit = {offset: k for k, offset in enumerate(self.stencil)}
+        self.master_mask = self._offsets_mask(diamond_stencil(master_vision_range))
+        self.thief_masks = {direction: self._offsets_mask(cone_stencil(thief_vision_range, direction))
+                            for direction in ("up", "down", "left", "right")}
+        self.master_stencil = diamond_stencil(master_vision_range)
+        self.thief_stencils = {direction: cone_stencil(thief_vision_range, direction)
+                               for direction in ("up", "down", "left", "right")}
+
+        self._los = [None] * (self.rows * self.cols)  # Bitmask ô nhìn thấy được, tính lười
+        self._zones = OrderedDict()
+
+    def _offsets_mask(self, offsets):
+        mask = 0
+        for offset in offsets:
+            mask |= 1 << self.bit[offset]
+        return mask
+
+    def _is_wall(self, r, c):
+        return not (0 <= r < self.rows and 0 <= c < self.cols) or self.map_grid[r][c] == 1
+
+    # Bitmask (theo stencil chung) các ô mà ô pos nhìn thấy được
+    def line_of_sight_mask(self, pos):
+        i = pos[0] * self.cols + pos[1]
+        mask = self._los[i]
+        if mask is None:
+            mask = 0
+            bit = self.bit
+            for offset in shadowcast(self._is_wall, pos, self.radius):
+                k = bit.get(offset)
+                if k is not None:
+                    mask |= 1 << k
+            self._los[i] = mask
+        return mask
+
+    # A có nhìn thấy B không (không dựng zone): tra bit, O(1) sau lần đầu
+    def can_see(self, a, b, vision_range=None):
+        dr, dc = b[0] - a[0], b[1] - a[1]
+        if abs(dr) + abs(dc) > (self.master_vision_range if vision_range is None else vision_range):
+            return False
+        k = self.bit.get((dr, dc))
+        if k is None:
+            return False
+        return bool(self.line_of_sight_mask(a) >> k & 1)
+
+    # Ông chủ (tại master_pos) có nhìn thấy nhân vật trộm không
+    def master_sees(self, master_pos, thief_pos):
+        return self.can_see(master_pos, thief_pos, self.master_vision_range)
+
+    def _zone(self, key, pos, stencil, stencil_mask):
+        zone = self._zones.get(key)
+        if zone is not None:
+            self._zones.move_to_end(key)
+            return zone
+        row, col = pos
+        visible = self.line_of_sight_mask(pos) & stencil_mask
+        bit = self.bit
+        zone = frozenset((row + dr, col + dc) for dr, dc in stencil
+                         if visible >> bit[(dr, dc)] & 1 and
+                         0 <= row + dr < self.rows and 0 <= col + dc < self.cols)
+        self._zones[key] = zone
+        if len(self._zones) > ZONE_CACHE_SIZE:
+            self._zones.popitem(last=False)
+        return zone
+
+    # Zone tầm nhìn của ông chủ (hình thoi, bị tường chặn)
+    def master_zone(self, master_pos):
+        key = (master_pos[0], master_pos[1], None)
+        return self._zone(key, master_pos, self.master_stencil, self.master_mask)
+
+    # Zone tầm nhìn của nhân vật trộm theo hướng (hình nón, bị tường chặn)
+    def thief_zone(self, thief_pos, direction):
+        key = (thief_pos[0], thief_pos[1], direction)
+        return self._zone(key, thief_pos, self.thief_stencils[direction], self.thief_masks[direction])
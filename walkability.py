@@ -0,0 +1,106 @@
+import math
+from array import array
+from collections import deque
+
+# 4 hướng di chuyển trên lưới (hàng, cột)
+DIRECTIONS = [(0, 1), (1, 0), (0, -1), (-1, 0)]
+
+
+# Hai hình chữ nhật (x, y, rộng, cao) có giao nhau không (giống pygame.Rect.colliderect)
+def rects_overlap(a, b):
+    return (a[0] < b[0] + b[2] and b[0] < a[0] + a[2] and
+            a[1] < b[1] + b[3] and b[1] < a[1] + a[3])
+
+
+# Lưới đi được tính sẵn cho một kích thước nhân vật: mỗi ô được đánh dấu
+# tường / va chạm đồ nội thất một lần, sau đó mọi phép kiểm tra là O(1).
+# Ô được đánh số phẳng: index = hàng * COLS + cột.
+class WalkGrid:
+    def __init__(self, grid, furniture_rects, cell_size, character_size, origin=(0, 0)):
+        self.rows = len(grid)
+        self.cols = len(grid[0]) if grid else 0
+        self.cell_size = cell_size
+        self.character_size = character_size
+        self.origin = origin
+
+        size = self.rows * self.cols
+        self.wall = bytearray(size)
+        self.furniture = bytearray(size)  # Hitbox đặt tại ô này va chạm đồ nội thất
+        for r in range(self.rows):
+            for c in range(self.cols):
+                if grid[r][c] == 1:
+                    self.wall[r * self.cols + c] = 1
+        for rect in furniture_rects:
+            self._mark_furniture(tuple(rect))
+
+        # Ô bị chặn = tường hoặc va chạm đồ nội thất
+        self.blocked = bytearray(w | f for w, f in zip(self.wall, self.furniture))
+        self.nearest = self._build_nearest_table()
+
+    # Chỉ duyệt các ô mà hitbox có thể chạm vào hình chữ nhật đồ nội thất
+    def _mark_furniture(self, rect):
+        fx, fy, fw, fh = rect
+        if fw <= 0 or fh <= 0:
+            return
+        ox, oy = self.origin
+        cs = self.cell_size
+        size = self.character_size
+        c_min = max(0, math.floor((fx - size - ox) / cs))
+        c_max = min(self.cols - 1, math.ceil((fx + fw - ox) / cs))
+        r_min = max(0, math.floor((fy - size - oy) / cs))
+        r_max = min(self.rows - 1, math.ceil((fy + fh - oy) / cs))
+        for r in range(r_min, r_max + 1):
+            for c in range(c_min, c_max + 1):
+                if rects_overlap(self.hitbox((r, c)), rect):
+                    self.furniture[r * self.cols + c] = 1
+
+    # BFS đa nguồn từ mọi ô trống: nearest[i] = ô trống gần ô i nhất (-1 nếu không có)
+    def _build_nearest_table(self):
+        nearest = array('i', [-1]) * (self.rows * self.cols)
+        queue = deque()
+        for i, b in enumerate(self.blocked):
+            if not b:
+                nearest[i] = i
+                queue.append(i)
+        cols = self.cols
+        while queue:
+            i = queue.popleft()
+            r, c = divmod(i, cols)
+            for dr, dc in DIRECTIONS:
+                nr, nc = r + dr, c + dc
+                if 0 <= nr < self.rows and 0 <= nc < cols:
+                    j = nr * cols + nc
+                    if nearest[j] == -1:
+                        nearest[j] = nearest[i]
+                        queue.append(j)
+        return nearest
+
+    # Hitbox (x, y, rộng, cao) của nhân vật đứng tại ô pos
+    def hitbox(self, pos):
+        return (pos[1] * self.cell_size + self.origin[0],
+                pos[0] * self.cell_size + self.origin[1],
+                self.character_size, self.character_size)
+
+    def in_bounds(self, r, c):
+        return 0 <= r < self.rows and 0 <= c < self.cols
+
+    # Nhân vật đứng tại pos có va chạm đồ nội thất không
+    def collides(self, pos):
+        r, c = pos
+        return self.in_bounds(r, c) and self.furniture[r * self.cols + c] == 1
+
+    # Ô nằm trong bản đồ, không phải tường và không va chạm đồ nội thất
+    def is_free(self, r, c):
+        return 0 <= r < self.rows and 0 <= c < self.cols and not self.blocked[r * self.cols + c]
+
+    # Vị trí không va chạm gần pos nhất (tra bảng, O(1)); None nếu bản đồ không còn ô trống
+    def nearest_free(self, pos):
+        r, c = pos
+        if not self.in_bounds(r, c):
+            return None
+        if not self.furniture[r * self.cols + c]:
+            return [r, c]
+        i = self.nearest[r * self.cols + c]
+        if i == -1:
+            return None
+        return list(divmod(i, self.cols))